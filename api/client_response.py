@@ -1,12 +1,19 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import openai
+import asyncio
 import json
+import logging
 import os
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+from .env_config import config
 from .utils.listings_filter import filter_listings
 from .lead_scoring import router as lead_scoring_router
 
+logger = logging.getLogger(__name__)
+
 # Load OpenAI API key from environment variable
 openai.api_key = os.getenv("OPENAI_API_KEY")
 if not openai.api_key:
@@ -40,11 +47,8 @@ def extract_intent_from_gpt(response_text: str) -> Dict:
         # Fallback to empty dict if parsing fails
         return {}
 
-@app.post("/api/respond-to-client", response_model=AIResponse)
-async def respond_to_client(client_message: ClientMessage):
-    try:
-        # Prepare the prompt for GPT
-        prompt = f"""You are an AI real estate agent. Extract the following information from this message:
+def intent_prompt(message: str) -> str:
+    return f"""You are an AI real estate agent. Extract the following information from this message:
         - intent (buy/rent/book)
         - price/budget
         - location
@@ -53,7 +57,7 @@ async def respond_to_client(client_message: ClientMessage):
         
         Format your response as a JSON object with these fields.
         
-        Client message: {client_message.message}
+        Client message: {message}
         
         Response format:
         {{
@@ -64,17 +68,29 @@ async def respond_to_client(client_message: ClientMessage):
             "type": "string"
         }}"""
 
-        # Call OpenAI API
-        response = await openai.ChatCompletion.acreate(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a helpful real estate assistant that extracts structured information from client messages."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+async def extract_intent(message: str, timeout: Optional[float] = None) -> Dict:
+    """Structured intent of a client message (first GPT call), optionally capped at `timeout` seconds"""
+    options = {"request_timeout": timeout} if timeout else {}
+    response = await openai.ChatCompletion.acreate(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": "You are a helpful real estate assistant that extracts structured information from client messages."},
+            {"role": "user", "content": intent_prompt(message)}
+        ],
+        **options
+    )
+    return extract_intent_from_gpt(response.choices[0].message.content)
+
+async def find_listings(message: str) -> List[Dict]:
+    """Extract the intent, then match listings (off the event loop)"""
+    intent_data = await extract_intent(message, timeout=config.RESPOND_STREAM_INTENT_TIMEOUT)
+    return await asyncio.get_running_loop().run_in_executor(None, filter_listings, intent_data)
 
+@app.post("/api/respond-to-client", response_model=AIResponse)
+async def respond_to_client(client_message: ClientMessage):
+    try:
         # Extract structured intent from GPT response
-        intent_data = extract_intent_from_gpt(response.choices[0].message.content)
+        intent_data = await extract_intent(client_message.message)
 
         # Get matching listings
         suggested_listings = filter_listings(intent_data)
@@ -103,4 +119,77 @@ async def respond_to_client(client_message: ClientMessage):
         )
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_response(message: str) -> AsyncIterator[str]:
+    """
+    Server-sent events for one client message: `token` events carrying the
+    reply as it is generated, one `listings` event as soon as the matches
+    are known, then `done` with the full reply (or `error`).
+
+    The reply is generated straight from the message, so generation starts
+    immediately instead of waiting for intent extraction; extraction and
+    the listing lookup run concurrently with it and their result is sent
+    between tokens (or after the last one). If they are still missing
+    RESPOND_STREAM_LISTINGS_WAIT seconds after the reply, an empty
+    `listings` event is sent instead.
+    """
+    listings_task = asyncio.ensure_future(find_listings(message))
+    listings_sent = False
+
+    def listings_event() -> str:
+        try:
+            listings = [jsonable_encoder(ListingResponse(**listing)) for listing in listings_task.result()]
+        except Exception as e:
+            logger.error(f"Listing lookup failed: {e}")
+            listings = []
+        return sse_event("listings", {"suggested_listings": listings})
+
+    try:
+        reply_prompt = f"""Client message: {message}
+        
+        Reply to the client in a helpful and professional way. Matching properties are shown to the client alongside your reply, so don't describe specific listings."""
+        stream = await openai.ChatCompletion.acreate(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a helpful real estate assistant."},
+                {"role": "user", "content": reply_prompt}
+            ],
+            stream=True
+        )
+        reply = []
+        async for chunk in stream:
+            text = chunk.choices[0].delta.get("content")
+            if text:
+                reply.append(text)
+                yield sse_event("token", {"text": text})
+            if not listings_sent and listings_task.done():
+                listings_sent = True
+                yield listings_event()
+        if not listings_sent:
+            finished, _ = await asyncio.wait([listings_task], timeout=config.RESPOND_STREAM_LISTINGS_WAIT)
+            listings_sent = True
+            if finished:
+                yield listings_event()
+            else:
+                logger.warning(f"Listing lookup took over {config.RESPOND_STREAM_LISTINGS_WAIT}s after the reply, sending none")
+                yield sse_event("listings", {"suggested_listings": []})
+        yield sse_event("done", {"response": "".join(reply)})
+    except Exception as e:
+        logger.error(f"Streaming response failed: {e}")
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        # Client disconnected or generation failed: don't leave the lookup running
+        listings_task.cancel()
+
+@app.post("/api/respond-to-client/stream")
+async def respond_to_client_stream(client_message: ClientMessage):
+    """Streaming variant of /api/respond-to-client as server-sent events"""
+    return StreamingResponse(
+        stream_response(client_message.message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,186 @@
+import json
+import os
+import struct
+import zipfile
+from typing import Any, Dict
+
+import numpy as np
+import scipy.sparse as sp
+
+from api.lead_features import LeadFeaturePipeline
+
+FORMAT_VERSION = 1
+
+class CompactForest:
+    """
+    A fitted binary random forest flattened into node arrays.
+
+    All trees' nodes are concatenated: `feature`/`threshold`/`left`/`right`
+    describe splits (left < 0 marks a leaf, child indices are global) and
+    `leaf_proba` holds each node's positive-class probability. Only the
+    input columns the forest actually splits on are kept (`columns`), so a
+    sparse feature matrix is narrowed to a small dense block before the
+    walk. Prediction advances every (row, tree) pair one level per NumPy
+    step (dropping pairs that reached a leaf), matching sklearn's float32
+    comparisons exactly.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], classes: np.ndarray):
+        self.columns = arrays['columns']
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.leaf_proba = arrays['leaf_proba']
+        self.max_depth = int(arrays['max_depth'][0])
+        self.classes_ = classes
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "CompactForest":
+        if len(forest.classes_) != 2:
+            raise ValueError("Only binary classifiers can be exported")
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        used = np.unique(np.concatenate([tree.feature[tree.children_left >= 0] for tree in trees] + [np.zeros(0, dtype=np.int64)]))
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        feature, threshold, left, right, leaf_proba = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            internal = tree.children_left >= 0
+            feature.append(np.where(internal, np.searchsorted(used, tree.feature), 0).astype(np.int32))
+            threshold.append(tree.threshold.astype(np.float64))
+            left.append(np.where(internal, tree.children_left + offset, -1).astype(np.int32))
+            right.append(np.where(internal, tree.children_right + offset, -1).astype(np.int32))
+            value = tree.value[:, 0, :]
+            leaf_proba.append(value[:, 1] / np.maximum(value.sum(axis=1), np.finfo(np.float64).tiny))
+        arrays = {
+            'columns': used.astype(np.int64),
+            'roots': offsets[:-1].astype(np.int32),
+            'feature': np.concatenate(feature),
+            'threshold': np.concatenate(threshold),
+            'left': np.concatenate(left),
+            'right': np.concatenate(right),
+            'leaf_proba': np.concatenate(leaf_proba),
+            'max_depth': np.array([max(tree.max_depth for tree in trees)], dtype=np.int32),
+        }
+        return cls(arrays, np.asarray(forest.classes_))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'columns': self.columns, 'roots': self.roots, 'feature': self.feature, 'threshold': self.threshold,
+            'left': self.left, 'right': self.right, 'leaf_proba': self.leaf_proba,
+            'max_depth': np.array([self.max_depth], dtype=np.int32),
+        }
+
+    def predict_proba(self, X) -> np.ndarray:
+        if sp.issparse(X):
+            X = X.tocsc()[:, self.columns].toarray()
+        else:
+            X = np.asarray(X)[:, self.columns]
+        X = X.astype(np.float32)
+        rows = np.repeat(np.arange(X.shape[0]), len(self.roots))
+        nodes = np.tile(self.roots, X.shape[0])
+        # Only pairs still at a split are advanced, so deep unbalanced trees don't cost depth x all pairs
+        pending = np.flatnonzero(self.left[nodes] >= 0)
+        while pending.size:
+            current = nodes[pending]
+            go_left = X[rows[pending], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[pending] = current
+            pending = pending[self.left[current] >= 0]
+        positive = self.leaf_proba[nodes].reshape(X.shape[0], len(self.roots)).mean(axis=1)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+class CompactLeadModel:
+    """
+    Feature pipeline plus CompactForest, exposing the two steps like the
+    sklearn Pipeline it was exported from (`named_steps`, `predict_proba`).
+    """
+
+    def __init__(self, features: LeadFeaturePipeline, forest: CompactForest):
+        self.features = features
+        self.forest = forest
+        self.named_steps = {'features': features, 'classifier': forest}
+        self.classes_ = forest.classes_
+
+    def predict_proba(self, records) -> np.ndarray:
+        return self.forest.predict_proba(self.features.transform(records))
+
+    def predict(self, records) -> np.ndarray:
+        return self.forest.predict(self.features.transform(records))
+
+def export_compact_model(model, path: str) -> str:
+    """
+    Write a fitted Pipeline([features, RandomForestClassifier]) as an
+    uncompressed .npz of flat arrays (atomically, for the serving registry)
+    """
+    features = model.named_steps['features']
+    forest = CompactForest.from_sklearn(model.named_steps['classifier'])
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'classes': forest.classes_.tolist(),
+        'n_features': features.n_features,
+        'ngram_range': list(features.ngram_range),
+    }
+    arrays = {f"forest_{name}": array for name, array in forest.arrays().items()}
+    arrays.update({
+        'features_idf': features.idf_,
+        'features_numeric_mean': features.numeric_mean_,
+        'features_numeric_scale': features.numeric_scale_,
+        'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+    })
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+def _mmap_npz(path: str) -> Dict[str, np.ndarray]:
+    # np.load can't memory-map .npz members, but uncompressed ones are plain .npy bytes inside the zip
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and can't be memory-mapped")
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+def load_compact_model(path: str, mmap: bool = True) -> CompactLeadModel:
+    """
+    Load an exported model. With mmap the arrays are mapped read-only from
+    the file, so loading is near-instant and all worker processes share one
+    copy through the page cache.
+    """
+    if mmap:
+        arrays = _mmap_npz(path)
+    else:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    meta: Dict[str, Any] = json.loads(bytes(np.asarray(arrays['meta'])).decode('utf-8'))
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format: {meta.get('format_version')}")
+    features = LeadFeaturePipeline(n_features=meta['n_features'], ngram_range=tuple(meta['ngram_range']))
+    features.idf_ = arrays['features_idf']
+    features.numeric_mean_ = arrays['features_numeric_mean']
+    features.numeric_scale_ = arrays['features_numeric_scale']
+    forest = CompactForest(
+        {name[len('forest_'):]: array for name, array in arrays.items() if name.startswith('forest_')},
+        np.asarray(meta['classes'])
+    )
+    return CompactLeadModel(features, forest)
@@ -83,6 +83,33 @@ class Config:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     
+    # Listings Catalog
+    LISTINGS_RELOAD_INTERVAL: float = float(os.getenv("LISTINGS_RELOAD_INTERVAL", "2.0"))
+    
+    # Lead Scoring
+    SCORING_STATE_CACHE_SIZE: int = int(os.getenv("SCORING_STATE_CACHE_SIZE", "10000"))
+    SCORING_STATE_PATH: str = os.getenv("SCORING_STATE_PATH", "")
+    SCORING_STATE_FLUSH_INTERVAL: float = float(os.getenv("SCORING_STATE_FLUSH_INTERVAL", "1.0"))
+    
+    # Lead Scoring Model Server
+    MODEL_DIR: str = os.getenv("MODEL_DIR", "models")
+    MODEL_POLL_INTERVAL: float = float(os.getenv("MODEL_POLL_INTERVAL", "5.0"))
+    MODEL_BATCH_MAX_SIZE: int = int(os.getenv("MODEL_BATCH_MAX_SIZE", "64"))
+    MODEL_BATCH_MAX_WAIT_MS: float = float(os.getenv("MODEL_BATCH_MAX_WAIT_MS", "5"))
+    MODEL_BATCH_WORKERS: int = int(os.getenv("MODEL_BATCH_WORKERS", "2"))
+    MODEL_BATCH_MAX_QUEUE: int = int(os.getenv("MODEL_BATCH_MAX_QUEUE", "2048"))
+    
+    # Client Response Pipeline (latency budgets in seconds)
+    RESPOND_PIPELINE_WORKERS: int = int(os.getenv("RESPOND_PIPELINE_WORKERS", "16"))
+    RESPOND_INTENT_WORKERS: int = int(os.getenv("RESPOND_INTENT_WORKERS", "32"))
+    RESPOND_TOTAL_BUDGET: float = float(os.getenv("RESPOND_TOTAL_BUDGET", "10.0"))
+    RESPOND_INTENT_BUDGET: float = float(os.getenv("RESPOND_INTENT_BUDGET", "6.0"))
+    RESPOND_LISTINGS_BUDGET: float = float(os.getenv("RESPOND_LISTINGS_BUDGET", "2.0"))
+    RESPOND_SCORE_BUDGET: float = float(os.getenv("RESPOND_SCORE_BUDGET", "1.0"))
+    RESPOND_SAVE_BUDGET: float = float(os.getenv("RESPOND_SAVE_BUDGET", "1.0"))
+    RESPOND_STREAM_LISTINGS_WAIT: float = float(os.getenv("RESPOND_STREAM_LISTINGS_WAIT", "5.0"))
+    RESPOND_STREAM_INTENT_TIMEOUT: float = float(os.getenv("RESPOND_STREAM_INTENT_TIMEOUT", "6.0"))
+    
     # CRM Integrations
     BITRIX_WEBHOOK_URL: str = os.getenv("BITRIX_WEBHOOK_URL", "")
     PIPEDRIVE_API_KEY: str = os.getenv("PIPEDRIVE_API_KEY", "")
@@ -99,6 +126,42 @@ class Config:
     WHATSAPP_PHONE_NUMBER_ID: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
     WHATSAPP_BUSINESS_ACCOUNT_ID: str = os.getenv("WHATSAPP_BUSINESS_ACCOUNT_ID", "")
     WHATSAPP_VERIFY_TOKEN: str = os.getenv("WHATSAPP_VERIFY_TOKEN", "serenity_whatsapp_verify_token")
+    WHATSAPP_HTTP2: bool = os.getenv("WHATSAPP_HTTP2", "true").lower() == "true"
+    WHATSAPP_HTTP_TIMEOUT: float = float(os.getenv("WHATSAPP_HTTP_TIMEOUT", "10.0"))
+    WHATSAPP_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("WHATSAPP_HTTP_CONNECT_TIMEOUT", "5.0"))
+    WHATSAPP_HTTP_MAX_CONNECTIONS: int = int(os.getenv("WHATSAPP_HTTP_MAX_CONNECTIONS", "20"))
+    WHATSAPP_HTTP_MAX_KEEPALIVE: int = int(os.getenv("WHATSAPP_HTTP_MAX_KEEPALIVE", "10"))
+    WHATSAPP_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("WHATSAPP_HTTP_KEEPALIVE_EXPIRY", "60.0"))
+    WHATSAPP_API_URL: str = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v17.0")
+    # Outbound queue; the send rate should match the account's Cloud API throughput tier
+    WHATSAPP_OUTBOUND_PATH: str = os.getenv("WHATSAPP_OUTBOUND_PATH", "whatsapp_outbound.sqlite3")
+    WHATSAPP_SEND_RATE: float = float(os.getenv("WHATSAPP_SEND_RATE", "80"))
+    WHATSAPP_SEND_BURST: int = int(os.getenv("WHATSAPP_SEND_BURST", "80"))
+    WHATSAPP_SEND_CONCURRENCY: int = int(os.getenv("WHATSAPP_SEND_CONCURRENCY", "16"))
+    WHATSAPP_SEND_MAX_ATTEMPTS: int = int(os.getenv("WHATSAPP_SEND_MAX_ATTEMPTS", "8"))
+    WHATSAPP_SEND_BACKOFF_BASE: float = float(os.getenv("WHATSAPP_SEND_BACKOFF_BASE", "1.0"))
+    WHATSAPP_SEND_BACKOFF_MAX: float = float(os.getenv("WHATSAPP_SEND_BACKOFF_MAX", "300.0"))
+    # A send not finished within this is assumed lost with its dispatcher and handed out again
+    WHATSAPP_SEND_LEASE_TIMEOUT: float = float(os.getenv("WHATSAPP_SEND_LEASE_TIMEOUT", "60.0"))
+    # Sent messages are kept this many days for inspection, then pruned; 0 deletes them once sent
+    WHATSAPP_SENT_RETENTION_DAYS: float = float(os.getenv("WHATSAPP_SENT_RETENTION_DAYS", "7"))
+    # Inbound webhook queue; consumers can also run separately (python -m api.whatsapp.inbound)
+    WHATSAPP_INBOUND_PATH: str = os.getenv("WHATSAPP_INBOUND_PATH", "whatsapp_inbound.sqlite3")
+    WHATSAPP_INBOUND_CONSUMERS_IN_APP: bool = os.getenv("WHATSAPP_INBOUND_CONSUMERS_IN_APP", "true").lower() == "true"
+    WHATSAPP_INBOUND_CONCURRENCY: int = int(os.getenv("WHATSAPP_INBOUND_CONCURRENCY", "4"))
+    WHATSAPP_INBOUND_MAX_ATTEMPTS: int = int(os.getenv("WHATSAPP_INBOUND_MAX_ATTEMPTS", "5"))
+    WHATSAPP_INBOUND_MAX_PENDING: int = int(os.getenv("WHATSAPP_INBOUND_MAX_PENDING", "10000"))
+    WHATSAPP_INBOUND_LEASE_TIMEOUT: float = float(os.getenv("WHATSAPP_INBOUND_LEASE_TIMEOUT", "300.0"))
+    WHATSAPP_INBOUND_POLL_INTERVAL: float = float(os.getenv("WHATSAPP_INBOUND_POLL_INTERVAL", "0.2"))
+    # Messages from one sender within the debounce window are answered as one turn
+    WHATSAPP_INBOUND_DEBOUNCE: float = float(os.getenv("WHATSAPP_INBOUND_DEBOUNCE", "1.5"))
+    WHATSAPP_INBOUND_MAX_DELAY: float = float(os.getenv("WHATSAPP_INBOUND_MAX_DELAY", "5.0"))
+    # Webhook replay detection; a path shares it across web workers and restarts
+    WHATSAPP_DEDUP_TTL: float = float(os.getenv("WHATSAPP_DEDUP_TTL", "86400"))
+    # Payloads without a message id are matched by hash, which repeated short texts can share
+    WHATSAPP_DEDUP_HASH_TTL: float = float(os.getenv("WHATSAPP_DEDUP_HASH_TTL", "300"))
+    WHATSAPP_DEDUP_CACHE_SIZE: int = int(os.getenv("WHATSAPP_DEDUP_CACHE_SIZE", "100000"))
+    WHATSAPP_DEDUP_PATH: str = os.getenv("WHATSAPP_DEDUP_PATH", "")
     
     # Email Configuration
     SMTP_SERVER: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -0,0 +1,192 @@
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from api.scoring_engine import scan_signals
+
+URGENCY_SIGNALS = ('urgent', 'this week', 'asap', 'cash buyer', 'ready to', 'immediately', 'quick', 'soon', 'right away')
+INTENT_SIGNALS = ('ready to buy', 'need to move', 'mortgage approved', 'loan approved', 'pre_approved', 'viewing', 'schedule')
+CLIENT_SENDERS = frozenset({'client', 'user', 'lead', 'customer'})
+
+NUMERIC_FEATURES = (
+    'log_budget', 'budget_mentioned', 'urgency_signals', 'intent_signals',
+    'message_count', 'log_response_latency', 'log_text_length'
+)
+
+_MONEY = re.compile(r'\$\s?(\d[\d,]*(?:\.\d+)?)\s*([kKmM]|million)?|(\d[\d,]*(?:\.\d+)?)\s*(million|[kK]\b|M\b)')
+_MULTIPLIERS = {'k': 1e3, 'm': 1e6, 'million': 1e6}
+
+def _records(X) -> List[Dict[str, Any]]:
+    if hasattr(X, 'to_dict'):
+        return X.to_dict('records')
+    return [dict(record) if not isinstance(record, dict) else record for record in X]
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _timestamp(value) -> Optional[float]:
+    if _missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def chat_text(record: Dict[str, Any]) -> str:
+    """The conversation text of a record: `chat_text`, else its messages joined by newlines"""
+    text = record.get('chat_text')
+    if not _missing(text):
+        return str(text)
+    messages = record.get('messages')
+    if isinstance(messages, list):
+        return '\n'.join(str(message.get('text', '')) for message in messages if isinstance(message, dict))
+    return ''
+
+def budget_from_text(text: str) -> float:
+    """Largest money amount mentioned in the text ($500k, 2 million, 750K), or 0"""
+    best = 0.0
+    for match in _MONEY.finditer(text):
+        number = match.group(1) or match.group(3)
+        unit = (match.group(2) or match.group(4) or '').lower()
+        try:
+            value = float(number.replace(',', '')) * _MULTIPLIERS.get(unit, 1)
+        except ValueError:
+            continue
+        best = max(best, value)
+    return best
+
+def message_count(record: Dict[str, Any], text: str) -> int:
+    messages = record.get('messages')
+    if isinstance(messages, list):
+        return len(messages)
+    if not _missing(record.get('message_count')):
+        return int(record['message_count'])
+    return sum(1 for line in text.splitlines() if line.strip())
+
+def response_latency(record: Dict[str, Any]) -> float:
+    """Mean seconds between a client message and the next agent reply"""
+    if not _missing(record.get('response_latency')):
+        return float(record['response_latency'])
+    messages = record.get('messages')
+    if not isinstance(messages, list):
+        return 0.0
+    gaps, waiting_since = [], None
+    for message in messages:
+        if not isinstance(message, dict):
+            continue
+        at = _timestamp(message.get('timestamp'))
+        if at is None:
+            continue
+        if str(message.get('sender', '')).lower() in CLIENT_SENDERS:
+            if waiting_since is None:
+                waiting_since = at
+        elif waiting_since is not None:
+            gaps.append(max(0.0, at - waiting_since))
+            waiting_since = None
+    return sum(gaps) / len(gaps) if gaps else 0.0
+
+def numeric_features(record: Dict[str, Any]) -> List[float]:
+    text = chat_text(record)
+    signals = scan_signals(text)
+    budget = record.get('budget')
+    budget = budget_from_text(text) if _missing(budget) else float(budget)
+    return [
+        math.log1p(max(budget, 0.0)),
+        float('budget_mention' in signals or budget > 0),
+        float(sum(signal in signals for signal in URGENCY_SIGNALS)),
+        float(sum(signal in signals for signal in INTENT_SIGNALS)),
+        float(message_count(record, text)),
+        math.log1p(response_latency(record)),
+        math.log1p(len(text))
+    ]
+
+class LeadFeaturePipeline(BaseEstimator, TransformerMixin):
+    """
+    Lead features shared by training and live scoring.
+
+    Input is a DataFrame or list of record dicts with `chat_text` (or a
+    `messages` list of {sender, text, timestamp}) and optionally `budget`,
+    `message_count` and `response_latency`. Output is a sparse CSR matrix:
+    hashed word n-grams weighted by TF-IDF, followed by standardized
+    NUMERIC_FEATURES (budget, urgency and intent signal counts, message
+    count, response latency, text length). The hashing vectorizer is
+    stateless, so fitting only accumulates document frequencies and numeric
+    moments; `partial_fit` can therefore be called chunk by chunk over data
+    that doesn't fit in memory. The fitted pipeline is pickled together with
+    the classifier (as the first step of a sklearn Pipeline).
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range=(1, 2)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def _vectorizer(self) -> HashingVectorizer:
+        return HashingVectorizer(
+            n_features=self.n_features,
+            ngram_range=self.ngram_range,
+            alternate_sign=False,
+            norm=None
+        )
+
+    def _reset(self):
+        self.n_documents_ = 0
+        self.document_frequency_ = np.zeros(self.n_features, dtype=np.int64)
+        self.numeric_sum_ = np.zeros(len(NUMERIC_FEATURES))
+        self.numeric_sq_sum_ = np.zeros(len(NUMERIC_FEATURES))
+
+    def fit(self, X, y=None):
+        self._reset()
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, 'n_documents_'):
+            self._reset()
+        records = _records(X)
+        counts = self._vectorizer().transform([chat_text(record) for record in records]).tocsc()
+        self.document_frequency_ += np.diff(counts.indptr)
+        numeric = np.array([numeric_features(record) for record in records], dtype=np.float64).reshape(-1, len(NUMERIC_FEATURES))
+        self.numeric_sum_ += numeric.sum(axis=0)
+        self.numeric_sq_sum_ += (numeric ** 2).sum(axis=0)
+        self.n_documents_ += len(records)
+        self._finalize()
+        return self
+
+    def fit_chunks(self, chunks: Iterable[Any]) -> "LeadFeaturePipeline":
+        """Fit over an iterable of DataFrame / record-list chunks"""
+        self._reset()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def _finalize(self):
+        n = max(self.n_documents_, 1)
+        # Smoothed IDF, as in sklearn's TfidfTransformer
+        self.idf_ = np.log((1 + n) / (1 + self.document_frequency_)) + 1.0
+        self.numeric_mean_ = self.numeric_sum_ / n
+        variance = np.maximum(self.numeric_sq_sum_ / n - self.numeric_mean_ ** 2, 0.0)
+        self.numeric_scale_ = np.where(variance > 0, np.sqrt(variance), 1.0)
+
+    def transform(self, X) -> sp.csr_matrix:
+        records = _records(X)
+        text = self._vectorizer().transform([chat_text(record) for record in records])
+        text = text @ sp.diags(self.idf_)
+        norms = np.sqrt(np.asarray(text.multiply(text).sum(axis=1))).ravel()
+        text = sp.diags(1.0 / np.where(norms > 0, norms, 1.0)) @ text
+        numeric = np.array([numeric_features(record) for record in records], dtype=np.float64).reshape(-1, len(NUMERIC_FEATURES))
+        numeric = (numeric - self.numeric_mean_) / self.numeric_scale_
+        return sp.hstack([text, sp.csr_matrix(numeric)], format='csr')
+
+def uses_feature_pipeline(model) -> bool:
+    """True for models trained with LeadFeaturePipeline (which take raw lead records)"""
+    steps = getattr(model, 'named_steps', None)
+    return bool(steps) and isinstance(next(iter(steps.values())), LeadFeaturePipeline)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-import re
+
+from api.scoring_state import scan_chat
 
 router = APIRouter()
 
@@ -13,21 +14,24 @@ class LeadPreferences(BaseModel):
 class LeadScoringRequest(BaseModel):
     chat_history: str
     preferences: LeadPreferences
+    # Set to score a growing conversation incrementally
+    conversation_id: Optional[str] = None
 
 class LeadScoringResponse(BaseModel):
     score: float
     tag: str
     reasons: List[str]
 
-def calculate_lead_score(chat_history: str, preferences: LeadPreferences) -> tuple[float, List[str]]:
+def calculate_lead_score(chat_history: str, preferences: LeadPreferences, conversation_id: Optional[str] = None) -> tuple[float, List[str]]:
     score = 0.0
     reasons = []
+    signals = scan_chat(chat_history, conversation_id)
     
     # Check for budget clarity
     if preferences.budget is not None:
         score += 0.3
         reasons.append(f"Clear budget specified: {preferences.budget}")
-    elif re.search(r'\$\d+[kK]?|\d+\s*(million|k|M)', chat_history):
+    elif 'budget_mention' in signals:
         score += 0.3
         reasons.append("Budget mentioned in conversation")
     
@@ -35,36 +39,36 @@ def calculate_lead_score(chat_history: str, preferences: LeadPreferences) -> tup
     if preferences.location:
         score += 0.3
         reasons.append(f"Specific location interest: {preferences.location}")
-    elif re.search(r'(in|at|near|around)\s+[A-Z][a-zA-Z\s]+', chat_history):
+    elif 'location_mention' in signals:
         score += 0.3
         reasons.append("Location mentioned in conversation")
     
     # Check for urgency signals
-    urgency_keywords = [
-        r'urgent',
-        r'this week',
-        r'asap',
-        r'cash buyer',
-        r'ready to',
-        r'immediately',
-        r'quick',
-        r'soon',
-        r'right away'
-    ]
+    urgency_keywords = {
+        'urgent',
+        'this week',
+        'asap',
+        'cash buyer',
+        'ready to',
+        'immediately',
+        'quick',
+        'soon',
+        'right away'
+    }
     
     if preferences.urgency and preferences.urgency.lower() == 'high':
         score += 0.2
         reasons.append("High urgency indicated in preferences")
-    elif any(re.search(keyword, chat_history.lower()) for keyword in urgency_keywords):
+    elif not signals.isdisjoint(urgency_keywords):
         score += 0.2
         reasons.append("Urgency signals detected in conversation")
     
     # Additional context-based scoring
-    if re.search(r'pre-?approved|mortgage approved|loan approved', chat_history.lower()):
+    if not signals.isdisjoint({'pre_approved', 'mortgage approved', 'loan approved'}):
         score += 0.1
         reasons.append("Pre-approved for financing")
     
-    if re.search(r'second viewing|follow.?up|another look', chat_history.lower()):
+    if not signals.isdisjoint({'second viewing', 'follow_up', 'another look'}):
         score += 0.1
         reasons.append("Requesting follow-up viewings")
     
@@ -76,7 +80,7 @@ def calculate_lead_score(chat_history: str, preferences: LeadPreferences) -> tup
 @router.post("/api/score-lead", response_model=LeadScoringResponse)
 async def score_lead(request: LeadScoringRequest) -> LeadScoringResponse:
     try:
-        score, reasons = calculate_lead_score(request.chat_history, request.preferences)
+        score, reasons = calculate_lead_score(request.chat_history, request.preferences, request.conversation_id)
         
         # Determine lead tag based on score
         tag = "cold"
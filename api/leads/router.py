@@ -1,17 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
-import re
+import numpy as np
 
 from api.database import get_db
+from api.scoring_engine import signal_matrix
+from api.scoring_state import scan_chat
 from .models import Lead, LeadNote
 from .schemas import (
     LeadCreate, LeadUpdate, LeadResponse, LeadList, LeadSearch,
     LeadNoteCreate, LeadNoteInDB, LeadScoreRequest, LeadScoreResponse,
-    LeadAnalytics, LeadTag
+    LeadScoreBatchRequest, LeadScoreBatchResponse, LeadAnalytics, LeadTag
 )
 
 router = APIRouter(
@@ -143,6 +146,58 @@ def get_lead_notes(
     
     return db.query(LeadNote).filter(LeadNote.lead_id == lead_id).order_by(LeadNote.created_at.desc()).all()
 
+# Chat signals behind the lead score
+URGENCY_KEYWORDS = ['urgent', 'asap', 'quickly', 'soon', 'immediately']
+INTEREST_KEYWORDS = ['interested', 'looking', 'want', 'need']
+SCORE_SIGNALS = URGENCY_KEYWORDS + INTEREST_KEYWORDS + ['number_mention']
+
+# Leads scored per chunk of a streamed batch
+SCORE_STREAM_CHUNK = 1000
+
+def score_leads(requests: List[LeadScoreRequest]) -> List[LeadScoreResponse]:
+    """
+    Score many leads at once. Chat signals are extracted into one boolean
+    matrix and the weights are applied column-wise with NumPy, in the same
+    order as single-lead scoring so results are identical.
+    """
+    signals = signal_matrix([scan_chat(r.chat_history, r.conversation_id) for r in requests], SCORE_SIGNALS)
+    urgency = signals[:, :len(URGENCY_KEYWORDS)].sum(axis=1)
+    interest = signals[:, len(URGENCY_KEYWORDS):len(URGENCY_KEYWORDS) + len(INTEREST_KEYWORDS)].sum(axis=1)
+    budget_mentioned = signals[:, -1]
+    has_budget = np.array([bool(r.preferences.budget) for r in requests], dtype=bool)
+    has_location = np.array([bool(r.preferences.location) for r in requests], dtype=bool)
+
+    score = np.zeros(len(requests))
+    # Check urgency signals (30% weight)
+    score += np.where(urgency > 0, np.minimum(urgency * 0.1, 0.3), 0.0)
+    # Check interest signals (20% weight)
+    score += np.where(interest > 0, np.minimum(interest * 0.1, 0.2), 0.0)
+    # Check budget clarity (30% weight)
+    score += np.where(has_budget, 0.3, np.where(budget_mentioned, 0.2, 0.0))
+    # Check location specificity (20% weight)
+    score += np.where(has_location, 0.2, 0.0)
+    # Normalize score to 0-1
+    score = np.clip(score, 0.0, 1.0)
+
+    # Determine tag based on score
+    tags = np.where(score >= 0.7, LeadTag.HOT.value, np.where(score >= 0.4, LeadTag.WARM.value, LeadTag.COLD.value))
+
+    results = []
+    for i in range(len(requests)):
+        reasons = []
+        if urgency[i]:
+            reasons.append("Detected urgency signals in conversation")
+        if interest[i]:
+            reasons.append("Shows clear interest in property")
+        if has_budget[i]:
+            reasons.append("Clear budget specified")
+        elif budget_mentioned[i]:
+            reasons.append("Budget mentioned in conversation")
+        if has_location[i]:
+            reasons.append("Specific location preference")
+        results.append(LeadScoreResponse(score=float(score[i]), tag=LeadTag(tags[i]), reasons=reasons))
+    return results
+
 @router.post("/score", response_model=LeadScoreResponse)
 def score_lead(
     request: LeadScoreRequest,
@@ -151,56 +206,27 @@ def score_lead(
     """
     Score a lead based on chat history and preferences
     """
-    score = 0.0
-    reasons = []
-
-    # Score based on chat history
-    urgency_keywords = ['urgent', 'asap', 'quickly', 'soon', 'immediately']
-    interest_keywords = ['interested', 'looking', 'want', 'need']
-    budget_pattern = r'\$?\d+[kK]?'
+    return score_leads([request])[0]
 
-    chat_lower = request.chat_history.lower()
-
-    # Check urgency signals (30% weight)
-    urgency_score = sum(keyword in chat_lower for keyword in urgency_keywords) * 0.1
-    if urgency_score > 0:
-        reasons.append(f"Detected urgency signals in conversation")
-        score += min(urgency_score, 0.3)
-
-    # Check interest signals (20% weight)
-    interest_score = sum(keyword in chat_lower for keyword in interest_keywords) * 0.1
-    if interest_score > 0:
-        reasons.append(f"Shows clear interest in property")
-        score += min(interest_score, 0.2)
-
-    # Check budget clarity (30% weight)
-    if request.preferences.budget:
-        score += 0.3
-        reasons.append("Clear budget specified")
-    elif re.search(budget_pattern, chat_lower):
-        score += 0.2
-        reasons.append("Budget mentioned in conversation")
-
-    # Check location specificity (20% weight)
-    if request.preferences.location:
-        score += 0.2
-        reasons.append("Specific location preference")
+@router.post("/score/batch", response_model=LeadScoreBatchResponse)
+def score_lead_batch(
+    batch: LeadScoreBatchRequest,
+    stream: bool = False
+):
+    """
+    Score many leads in one call; results are returned in request order.
+    With stream=true the results are streamed as NDJSON, one score per line,
+    scoring SCORE_STREAM_CHUNK leads at a time.
+    """
+    if not stream:
+        return LeadScoreBatchResponse(results=score_leads(batch.leads))
 
-    # Normalize score to 0-1
-    score = min(max(score, 0.0), 1.0)
+    def lines():
+        for offset in range(0, len(batch.leads), SCORE_STREAM_CHUNK):
+            for result in score_leads(batch.leads[offset:offset + SCORE_STREAM_CHUNK]):
+                yield result.model_dump_json() + "\n"
 
-    # Determine tag based on score
-    tag = LeadTag.COLD
-    if score >= 0.7:
-        tag = LeadTag.HOT
-    elif score >= 0.4:
-        tag = LeadTag.WARM
-
-    return LeadScoreResponse(
-        score=score,
-        tag=tag,
-        reasons=reasons
-    )
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/analytics", response_model=LeadAnalytics)
 def get_lead_analytics(
@@ -91,12 +91,20 @@ class LeadSearch(BaseModel):
 class LeadScoreRequest(BaseModel):
     chat_history: str
     preferences: LeadPreferences
+    # Set to score a growing conversation incrementally
+    conversation_id: Optional[str] = None
 
 class LeadScoreResponse(BaseModel):
     score: float = Field(..., ge=0.0, le=1.0)
     tag: LeadTag
     reasons: List[str]
 
+class LeadScoreBatchRequest(BaseModel):
+    leads: List[LeadScoreRequest]
+
+class LeadScoreBatchResponse(BaseModel):
+    results: List[LeadScoreResponse]
+
 class LeadAnalytics(BaseModel):
     total_leads: int
     hot_leads_percentage: float
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Query, HTTPException
 from typing import List, Optional
-import json
 import logging
 from pathlib import Path
 
+from api.utils.catalog import get_catalog
+from api.utils.listings_index import ListingsIndex
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -37,6 +39,12 @@ MOCK_LISTINGS = [
     }
 ]
 
+LISTINGS_FILE = Path("listings_test.json")
+
+def get_listings_index() -> ListingsIndex:
+    """Return the process-wide listings index, rebuilt whenever LISTINGS_FILE changes"""
+    return get_catalog(LISTINGS_FILE, build=ListingsIndex, fallback=lambda: MOCK_LISTINGS).get()
+
 @router.get("/listings")
 async def get_listings(
     budget: Optional[int] = Query(None, description="Maximum budget"),
@@ -49,35 +57,13 @@ async def get_listings(
     Get all or filtered property listings
     """
     try:
-        # Try to load from listings.json if it exists
-        listings_file = Path("listings_test.json")
-        if listings_file.exists():
-            with open(listings_file, 'r') as f:
-                content = f.read().strip()
-                if content and content != "[]":
-                    listings = json.loads(content)
-                else:
-                    listings = MOCK_LISTINGS
-        else:
-            listings = MOCK_LISTINGS
-        
-        # Apply filters
-        filtered_listings = listings
-        
-        if budget:
-            filtered_listings = [l for l in filtered_listings if l.get('price', 0) <= budget]
-        
-        if min_price:
-            filtered_listings = [l for l in filtered_listings if l.get('price', 0) >= min_price]
-        
-        if location:
-            filtered_listings = [l for l in filtered_listings if location.lower() in l.get('location', '').lower()]
-        
-        if bedrooms:
-            filtered_listings = [l for l in filtered_listings if l.get('bedrooms', 0) >= bedrooms]
-        
-        if property_type:
-            filtered_listings = [l for l in filtered_listings if property_type.lower() in l.get('type', '').lower()]
+        filtered_listings = get_listings_index().search(
+            budget=budget,
+            min_price=min_price,
+            location=location,
+            bedrooms=bedrooms,
+            property_type=property_type
+        )
         
         logger.info(f"Returning {len(filtered_listings)} listings with filters: budget={budget}, location={location}, bedrooms={bedrooms}")
         
@@ -20,6 +20,9 @@ from api.healthcheck import router as healthcheck_router
 from api.properties import router as properties_router
 from api.leads import router as leads_router
 from api.whatsapp import router as whatsapp_router
+from api.whatsapp.client import close_http_client, open_http_client
+from api.whatsapp.outbound import start_outbound_queue, stop_outbound_queue
+from api.whatsapp.inbound import start_inbound_consumers, stop_inbound_consumers
 
 # Create logs directory if it doesn't exist
 Path("logs").mkdir(exist_ok=True)
@@ -70,6 +73,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shared outbound clients live as long as the app
+@app.on_event("startup")
+async def startup():
+    await open_http_client()
+    await start_outbound_queue()
+    await start_inbound_consumers()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_inbound_consumers()
+    await stop_outbound_queue()
+    await close_http_client()
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
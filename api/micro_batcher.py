@@ -0,0 +1,175 @@
+import asyncio
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+class BatcherOverloaded(Exception):
+    """Raised by MicroBatcher.submit when the queue is at max_queue_depth"""
+
+@dataclass
+class BatcherMetrics:
+    requests: int = 0
+    rejected: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    max_queue_depth: int = 0
+    batch_size_total: int = 0
+    batch_size_max: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+    predict_ms_total: float = 0.0
+    predict_ms_max: float = 0.0
+    batch_size_histogram: List[int] = field(default_factory=lambda: [0] * (len(BATCH_SIZE_BUCKETS) + 1))
+
+    def record_batch(self, size: int, waits_ms: Sequence[float], predict_ms: float, failed: bool):
+        self.batches += 1
+        self.failed_batches += failed
+        self.batch_size_total += size
+        self.batch_size_max = max(self.batch_size_max, size)
+        self.batch_size_histogram[bisect_left(BATCH_SIZE_BUCKETS, size)] += 1
+        self.wait_ms_total += sum(waits_ms)
+        self.wait_ms_max = max(self.wait_ms_max, max(waits_ms))
+        self.predict_ms_total += predict_ms
+        self.predict_ms_max = max(self.predict_ms_max, predict_ms)
+
+    def snapshot(self, queue_depth: int = 0, in_flight: int = 0) -> Dict[str, Any]:
+        batched = self.batch_size_total
+        buckets = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ['+Inf']
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight_batches": in_flight,
+            "batch_size": {
+                "mean": batched / self.batches if self.batches else 0.0,
+                "max": self.batch_size_max,
+                "histogram": dict(zip(buckets, self.batch_size_histogram))
+            },
+            "wait_ms": {
+                "mean": self.wait_ms_total / batched if batched else 0.0,
+                "max": self.wait_ms_max
+            },
+            "predict_ms": {
+                "mean": self.predict_ms_total / self.batches if self.batches else 0.0,
+                "max": self.predict_ms_max
+            }
+        }
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls.
+
+    `submit()` queues an item and waits for its result. A collector task
+    takes the first queued item, keeps collecting for up to `max_wait_ms` or
+    until `max_batch_size` items, runs `predict(items)` on a dedicated
+    thread pool and resolves every waiting future with its own result. Up
+    to `workers` batches run at once; while they are busy the next batch
+    accumulates, so batch size grows with load. Past `max_queue_depth`
+    waiting items (0 = unbounded) `submit()` fails fast with
+    BatcherOverloaded. Batch sizes, queue waits, prediction time and queue
+    depth are tracked in `metrics`.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        workers: int = 1,
+        max_queue_depth: int = 0
+    ):
+        self.predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self.max_queue_depth = max(0, max_queue_depth)
+        self.metrics = BatcherMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return self.metrics.snapshot(self.queue_depth, len(self._in_flight))
+
+    async def submit(self, item: Any) -> Any:
+        if self._collector is None or self._collector.done():
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise BatcherOverloaded(f"{self.max_queue_depth} requests already waiting for a batch")
+        self.metrics.requests += 1
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self._queue.qsize())
+        return await future
+
+    def _start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='micro-batcher')
+        self._queue = asyncio.Queue(maxsize=self.max_queue_depth)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        while True:
+            await slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._run(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        start = time.perf_counter()
+        waits_ms = [(start - queued_at) * 1000 for _, _, queued_at in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.predict, [item for item, _, _ in batch]
+            )
+        except Exception as e:
+            self.metrics.record_batch(len(batch), waits_ms, (time.perf_counter() - start) * 1000, failed=True)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.metrics.record_batch(len(batch), waits_ms, (time.perf_counter() - start) * 1000, failed=False)
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        tasks = [task for task in [self._collector, *self._in_flight] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._collector = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,141 @@
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+import joblib
+
+from api.compact_forest import load_compact_model
+from api.env_config import config
+
+logger = logging.getLogger(__name__)
+
+# Pickled sklearn models and compact exports (api/compact_forest.py); a compact export wins for the same version
+MODEL_GLOBS = ('lead_scorer_*.pkl', 'lead_scorer_*.npz')
+
+_VERSION = re.compile(r'lead_scorer_(.+)\.(?:pkl|npz)$')
+
+Signature = Optional[Tuple[str, int, int, int]]
+
+class ServedModel(NamedTuple):
+    version: str
+    path: str
+    signature: Signature
+    model: Any
+
+def model_version(path: Union[str, Path]) -> str:
+    """Version tag of a model file, e.g. "v3" for models/lead_scorer_v3.pkl"""
+    match = _VERSION.search(Path(path).name)
+    return match.group(1) if match else Path(path).stem
+
+def _version_key(version: str):
+    # Natural order, so v10 sorts after v9
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+def _file_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_ino, st.st_size)
+
+class ModelRegistry:
+    """
+    Versioned, hot-swapping registry of lead scoring models.
+
+    Versions are the `lead_scorer_<version>.pkl` / `.npz` files in `model_dir`; the
+    newest (natural sort) is served unless a path is pinned or a version is
+    activated explicitly. Nothing is deserialized until the first `get()`
+    (or `warm()`, which loads in the background). Afterwards the directory is
+    polled at most once per `poll_interval`; a new or rewritten file is
+    loaded by a background thread and swapped in atomically, so in-flight
+    predictions finish on the model they started with. A file that fails to
+    load (e.g. caught mid-copy) is logged and retried on the next poll.
+    """
+
+    def __init__(
+        self,
+        model_dir: Union[str, Path] = config.MODEL_DIR,
+        patterns: Tuple[str, ...] = MODEL_GLOBS,
+        pinned_path: Optional[Union[str, Path]] = None,
+        poll_interval: float = config.MODEL_POLL_INTERVAL
+    ):
+        self.model_dir = Path(model_dir)
+        self.patterns = patterns
+        self.pinned_path = Path(pinned_path) if pinned_path else None
+        self.poll_interval = poll_interval
+        self._active: Optional[ServedModel] = None
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def versions(self) -> Dict[str, str]:
+        """Available model versions (oldest first) mapped to their files"""
+        paths = {model_version(path): str(path) for pattern in self.patterns for path in sorted(self.model_dir.glob(pattern))}
+        return {version: paths[version] for version in sorted(paths, key=_version_key)}
+
+    @property
+    def active(self) -> Optional[ServedModel]:
+        return self._active
+
+    def get(self) -> ServedModel:
+        """Return the model to serve, scheduling a swap if a newer file appeared"""
+        active = self._active
+        if active is None:
+            with self._lock:
+                if self._active is None:
+                    self._active = self._load(self._candidate())
+                    self._last_poll = time.monotonic()
+            return self._active
+
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            path = self._candidate()
+            if _file_signature(path) != active.signature and self._lock.acquire(blocking=False):
+                threading.Thread(target=self._swap, args=(path,), daemon=True).start()
+        return active
+
+    def warm(self):
+        """Load the first model in a background thread so startup doesn't wait on it"""
+        threading.Thread(target=self.get, daemon=True).start()
+
+    def activate(self, version: Optional[str] = None) -> ServedModel:
+        """Serve a specific version (e.g. to roll back), or the newest again with None"""
+        with self._lock:
+            if version is None:
+                self.pinned_path = None
+            else:
+                versions = self.versions()
+                if version not in versions:
+                    raise KeyError(f"Unknown model version: {version}")
+                self.pinned_path = Path(versions[version])
+            self._active = self._load(self._candidate())
+            self._last_poll = time.monotonic()
+        return self._active
+
+    def _candidate(self) -> Path:
+        if self.pinned_path is not None:
+            return self.pinned_path
+        versions = self.versions()
+        if not versions:
+            raise FileNotFoundError(f"No {' / '.join(self.patterns)} models found in {self.model_dir}")
+        return Path(versions[next(reversed(versions))])
+
+    def _swap(self, path: Path):
+        try:
+            self._active = self._load(path)
+            logger.info(f"Swapped lead scoring model to {self._active.version} ({path})")
+        except Exception as e:
+            logger.warning(f"Keeping model {self._active.version}, failed to load {path}: {e}")
+        finally:
+            self._lock.release()
+
+    def _load(self, path: Path) -> ServedModel:
+        signature = _file_signature(path)
+        start = time.perf_counter()
+        model = load_compact_model(str(path)) if path.suffix == '.npz' else joblib.load(path)
+        logger.info(f"Loaded lead scoring model {path} in {time.perf_counter() - start:.2f}s")
+        return ServedModel(model_version(path), str(path), signature, model)
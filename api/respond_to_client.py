@@ -1,12 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import openai
+import asyncio
 import json
+import logging
 import os
+import threading
+import time
+
+try:
+    from .env_config import config
+except ImportError:
+    from env_config import config
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+T = TypeVar('T')
+
 # --- Pydantic Models ---
 class ClientRequest(BaseModel):
     message: str
@@ -75,9 +90,12 @@ def score_lead(chat_history, preferences) -> Dict[str, Any]:
     return {"score": score, "tag": tag, "escalate": escalate}
 
 # --- Helper: Save lead (simulate) ---
+_leads_file_lock = threading.Lock()
+
 def save_lead(lead_data: Dict[str, Any]):
     try:
-        with open('leads.json', 'a') as f:
+        # Pipeline threads append concurrently; keep each record on its own line
+        with _leads_file_lock, open('leads.json', 'a') as f:
             f.write(json.dumps(lead_data) + '\n')
     except Exception as e:
         print(f"Failed to save lead: {e}")
@@ -113,20 +131,98 @@ def extract_intent(message: str, language: str = 'en') -> Dict[str, Any]:
         print(f"AI extraction failed: {e}")
         return {"intent": "ask", "location": "", "price": 0, "type": "", "bedrooms": 0, "urgency": "normal"}
 
-# --- Endpoint ---
-@router.post("/api/respond_to_client", response_model=ClientResponse)
-def respond_to_client(req: ClientRequest):
-    # 1. Extract intent and filters
+# --- Pipeline ---
+# Blocking steps (AI calls, file I/O) run here, never on the event loop
+_executor = ThreadPoolExecutor(max_workers=config.RESPOND_PIPELINE_WORKERS, thread_name_prefix='respond')
+# The network-bound intent call gets its own threads, so timed-out model calls can't starve the local stages
+_intent_executor = ThreadPoolExecutor(max_workers=config.RESPOND_INTENT_WORKERS, thread_name_prefix='respond-intent')
+
+DEFAULT_INTENT = {"intent": "ask", "location": "", "price": 0, "type": "", "bedrooms": 0, "urgency": "normal"}
+DEFAULT_LEAD_SCORE = {"score": 0.0, "tag": "unscored", "escalate": False}
+
+# Per-stage latency budgets in seconds; the whole response also has to fit RESPOND_TOTAL_BUDGET
+STAGE_BUDGETS = {
+    "extract_intent": config.RESPOND_INTENT_BUDGET,
+    "filter_listings": config.RESPOND_LISTINGS_BUDGET,
+    "score_lead": config.RESPOND_SCORE_BUDGET,
+    "save_lead": config.RESPOND_SAVE_BUDGET,
+}
+
+@dataclass
+class StageMetrics:
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    ms_total: float = 0.0
+    ms_max: float = 0.0
+
+    def record(self, ms: float, timed_out: bool = False, failed: bool = False):
+        self.calls += 1
+        self.timeouts += timed_out
+        self.errors += failed
+        self.ms_total += ms
+        self.ms_max = max(self.ms_max, ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "mean_ms": self.ms_total / self.calls if self.calls else 0.0,
+            "max_ms": self.ms_max
+        }
+
+_stage_metrics: Dict[str, StageMetrics] = {name: StageMetrics() for name in list(STAGE_BUDGETS) + ["total"]}
+
+def pipeline_metrics() -> Dict[str, Any]:
+    return {name: metrics.snapshot() for name, metrics in _stage_metrics.items()}
+
+async def run_stage(
+    name: str,
+    func: Callable[..., T],
+    *args,
+    fallback: T,
+    deadline: float,
+    executor: ThreadPoolExecutor = _executor
+) -> T:
+    """
+    Run a blocking step on a pipeline thread pool within its budget
+    (capped by what is left of the overall deadline). On timeout or error
+    the fallback is returned, so one slow dependency degrades the reply
+    instead of stalling it; a timed-out step keeps its thread until it
+    returns, which the pool size bounds.
+    """
+    budget = min(STAGE_BUDGETS[name], deadline - time.monotonic())
+    start = time.perf_counter()
     try:
-        intent_data = extract_intent(req.message, req.language)
+        if budget <= 0:
+            raise asyncio.TimeoutError()
+        result = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(executor, func, *args), budget)
+    except asyncio.TimeoutError:
+        _stage_metrics[name].record((time.perf_counter() - start) * 1000, timed_out=True)
+        logger.warning(f"{name} exceeded its {max(budget, 0.0):.2f}s budget, using fallback")
+        return fallback
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI extraction failed: {e}")
+        _stage_metrics[name].record((time.perf_counter() - start) * 1000, failed=True)
+        logger.error(f"{name} failed, using fallback: {e}")
+        return fallback
+    _stage_metrics[name].record((time.perf_counter() - start) * 1000)
+    return result
+
+# --- Endpoint ---
+@router.post("/api/respond_to_client", response_model=ClientResponse)
+async def respond_to_client(req: ClientRequest):
+    start = time.perf_counter()
+    deadline = time.monotonic() + config.RESPOND_TOTAL_BUDGET
 
-    # 2. Filter listings
-    listings = filter_listings(intent_data)
+    # 1. Extract intent and filters
+    intent_data = await run_stage("extract_intent", extract_intent, req.message, req.language, fallback=DEFAULT_INTENT, deadline=deadline, executor=_intent_executor)
 
-    # 3. Score lead
-    lead_score = score_lead([req.message], intent_data)
+    # 2. Filter listings and 3. score the lead; both only need the intent
+    listings, lead_score = await asyncio.gather(
+        run_stage("filter_listings", filter_listings, intent_data, fallback=[], deadline=deadline),
+        run_stage("score_lead", score_lead, [req.message], intent_data, fallback=DEFAULT_LEAD_SCORE, deadline=deadline)
+    )
 
     # 4. Save lead (simulate)
     lead_data = {
@@ -136,22 +232,28 @@ def respond_to_client(req: ClientRequest):
         "tag": lead_score["tag"],
         "escalate": lead_score["escalate"],
     }
-    save_lead(lead_data)
+    await run_stage("save_lead", save_lead, lead_data, fallback=None, deadline=deadline)
 
     # 5. If hot lead, escalate
     escalate = lead_score["escalate"]
     if escalate:
         # Simulate notification trigger (could POST to /api/notifications)
-        print("Escalating hot lead notification!")
+        logger.info("Escalating hot lead notification!")
 
     # 6. Compose reply
     reply = f"Thank you for your message! Based on your interest to {intent_data['intent']} in {intent_data['location']}, here are some listings you might like."
     intent_summary = f"Intent: {intent_data['intent']}, Location: {intent_data['location']}, Price: {intent_data['price']}, Type: {intent_data['type']}, Bedrooms: {intent_data['bedrooms']}"
 
+    _stage_metrics["total"].record((time.perf_counter() - start) * 1000)
     return ClientResponse(
         reply=reply,
         listings=[Listing(**l) for l in listings],
         lead=LeadInfo(**lead_score),
         intent_summary=intent_summary,
         escalate=escalate
-    ) 
\ No newline at end of file
+    )
+
+@router.get("/api/respond_to_client/metrics")
+async def respond_to_client_metrics():
+    """Per-stage latency, timeout and error counts of the response pipeline"""
+    return pipeline_metrics()
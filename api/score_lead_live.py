@@ -1,21 +1,87 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import joblib
+from typing import Any, Dict, List, Optional
+import numpy as np
 import os
 
+from api.env_config import config
+from api.lead_features import uses_feature_pipeline
+from api.micro_batcher import BatcherOverloaded, MicroBatcher
+from api.model_server import ModelRegistry
+
 app = FastAPI()
 
-MODEL_PATH = os.getenv('MODEL_PATH', 'models/lead_scorer_v1.pkl')
-model = joblib.load(MODEL_PATH)
+# Pin a model file; by default the newest models/lead_scorer_*.pkl / .npz is served and hot-swapped
+MODEL_PATH = os.getenv('MODEL_PATH')
+registry = ModelRegistry(pinned_path=MODEL_PATH)
 
 class LeadRequest(BaseModel):
     chat_text: str
-    # Add more fields as needed
+    # Optional inputs of the feature pipeline; derived from chat_text when missing
+    budget: Optional[float] = None
+    messages: Optional[List[Dict[str, Any]]] = None
+    message_count: Optional[int] = None
+    response_latency: Optional[float] = None
 
-@app.post('/score_lead_live')
-def score_lead_live(lead: LeadRequest):
+class ActivateRequest(BaseModel):
+    # None serves the newest version again
+    version: Optional[str] = None
+
+def intent_features(chat_text: str) -> List[int]:
     # Simple feature: intent_score
-    intent_score = int(any(word in lead.chat_text.lower() for word in ['buy', 'urgent', 'now', 'call']))
-    X = [[intent_score]]
-    score = model.predict_proba(X)[0][1]
-    return {"lead_score": float(score)} 
\ No newline at end of file
+    intent_score = int(any(word in chat_text.lower() for word in ['buy', 'urgent', 'now', 'call']))
+    return [intent_score]
+
+def predict_batch(records: List[Dict[str, Any]]):
+    served = registry.get()
+    if uses_feature_pipeline(served.model):
+        X = records
+    else:
+        # Models trained before the feature pipeline take the single intent feature
+        X = np.asarray([intent_features(record['chat_text']) for record in records])
+    scores = served.model.predict_proba(X)[:, 1]
+    return [(float(score), served.version) for score in scores]
+
+batcher = MicroBatcher(
+    predict_batch,
+    max_batch_size=config.MODEL_BATCH_MAX_SIZE,
+    max_wait_ms=config.MODEL_BATCH_MAX_WAIT_MS,
+    workers=config.MODEL_BATCH_WORKERS,
+    max_queue_depth=config.MODEL_BATCH_MAX_QUEUE
+)
+
+@app.on_event("startup")
+async def warm_model():
+    registry.warm()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.close()
+
+@app.post('/score_lead_live')
+async def score_lead_live(lead: LeadRequest):
+    try:
+        score, version = await batcher.submit(dict(lead))
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"lead_score": score, "model_version": version}
+
+@app.get('/score_lead_live/metrics')
+def batcher_metrics():
+    return batcher.stats()
+
+@app.get('/models')
+def list_models():
+    active = registry.active
+    return {
+        "active": active.version if active else None,
+        "versions": list(registry.versions())
+    }
+
+@app.post('/models/activate')
+def activate_model(request: ActivateRequest):
+    try:
+        served = registry.activate(request.version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"active": served.version}
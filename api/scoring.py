@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Literal
+from typing import List, Dict, Literal, Optional
 import logging
 import sys
 import os
@@ -8,6 +8,8 @@ import os
 # Add parent directory to path if needed
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from api.scoring_state import scan_chat
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,8 @@ class LeadPreferences(BaseModel):
 class LeadScoringRequest(BaseModel):
     chat_history: str
     preferences: LeadPreferences
+    # Set to score a growing conversation incrementally
+    conversation_id: Optional[str] = None
 
 class LeadScoringResponse(BaseModel):
     score: float
@@ -61,7 +65,7 @@ async def score_lead(request: LeadScoringRequest):
             reasons.append("Entry-level budget buyer (+5 points)")
         
         # Analyze chat history for buying signals
-        chat_lower = request.chat_history.lower()
+        signals = scan_chat(request.chat_history, request.conversation_id)
         
         # Strong buying signals
         strong_signals = [
@@ -75,7 +79,7 @@ async def score_lead(request: LeadScoringRequest):
         ]
         
         for signal, points in strong_signals:
-            if signal in chat_lower:
+            if signal in signals:
                 score += points
                 reasons.append(f"Strong buying signal: '{signal}' (+{points} points)")
         
@@ -90,7 +94,7 @@ async def score_lead(request: LeadScoringRequest):
         ]
         
         for question, points in serious_questions:
-            if question in chat_lower:
+            if question in signals:
                 score += points
                 reasons.append(f"Serious inquiry: '{question}' (+{points} points)")
         
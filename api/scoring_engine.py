@@ -0,0 +1,99 @@
+import re
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Pattern, Sequence, Tuple
+
+import numpy as np
+
+# Optional Aho-Corasick automaton for keyword rules
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+@dataclass(frozen=True)
+class Rule:
+    """A lead signal detected in chat text"""
+    signal: str
+    pattern: str
+    literal: bool = False
+    case_sensitive: bool = False
+
+# Keyword signals (case-insensitive substring matches); the signal name is the phrase itself
+KEYWORDS = (
+    # Urgency
+    'urgent', 'this week', 'asap', 'cash buyer', 'ready to', 'immediately',
+    'quick', 'quickly', 'soon', 'right away',
+    # Buying signals
+    'ready to buy', 'need to move', 'mortgage approved', 'loan approved',
+    'viewing', 'second viewing', 'another look', 'schedule', 'when can i see',
+    # Serious inquiries
+    'price negotiable', 'payment plan', 'maintenance fee', 'available', 'school', 'amenities',
+    # Interest
+    'interested', 'looking', 'want', 'need',
+)
+
+# Pattern signals
+PATTERNS = (
+    Rule('budget_mention', r'\$\d+[kK]?|\d+\s*(?:million|k|M)', case_sensitive=True),
+    Rule('number_mention', r'\$?\d+[kK]?'),
+    Rule('location_mention', r'(?:in|at|near|around)\s+[A-Z][a-zA-Z\s]+', case_sensitive=True),
+    Rule('pre_approved', r'pre-?approved'),
+    Rule('follow_up', r'follow.?up'),
+)
+
+RULES: Tuple[Rule, ...] = tuple(Rule(keyword, re.escape(keyword), literal=True) for keyword in KEYWORDS) + PATTERNS
+
+class SignalScanner:
+    """
+    Detects every rule's signal in chat text, with the rule table compiled once.
+
+    Keyword rules are matched against a single lower-cased copy of the text:
+    in one pass with an Aho-Corasick automaton when pyahocorasick is
+    installed, otherwise with one C-level substring search per keyword
+    (CPython's `re` tries every alternative at every offset, so a combined
+    keyword regex is slower than that). Pattern rules are precompiled and
+    searched once each.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        rules = list(rules)
+        self.keywords: Tuple[str, ...] = tuple(r.signal.lower() for r in rules if r.literal)
+        self.patterns: List[Tuple[str, Pattern]] = [
+            (r.signal, re.compile(r.pattern, 0 if r.case_sensitive else re.IGNORECASE))
+            for r in rules if not r.literal
+        ]
+        self.signals: FrozenSet[str] = frozenset(r.signal for r in rules)
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Return the set of signals present in text"""
+        lowered = text.lower()
+        if self._automaton is not None:
+            found = {keyword for _, keyword in self._automaton.iter(lowered)}
+        else:
+            found = {keyword for keyword in self.keywords if keyword in lowered}
+        found.update(signal for signal, regex in self.patterns if regex.search(text))
+        return frozenset(found)
+
+SCANNER = SignalScanner(RULES)
+
+def scan_signals(text: str) -> FrozenSet[str]:
+    """Return the set of lead signals present in chat text"""
+    return SCANNER.scan(text)
+
+def signal_matrix(signal_sets: Sequence[FrozenSet[str]], signals: Sequence[str]) -> np.ndarray:
+    """Boolean (len(signal_sets), len(signals)) matrix of which signals each scanned chat contains"""
+    columns = {signal: j for j, signal in enumerate(signals)}
+    matrix = np.zeros((len(signal_sets), len(signals)), dtype=bool)
+    for i, found in enumerate(signal_sets):
+        for signal in found:
+            j = columns.get(signal)
+            if j is not None:
+                matrix[i, j] = True
+    return matrix
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, NamedTuple, Optional
+
+from api.env_config import config
+from api.scoring_engine import SCANNER, SignalScanner, scan_signals
+
+logger = logging.getLogger(__name__)
+
+# Already-scanned characters rescanned with each new message, so signals
+# straddling the previous end of the history ("ready" | " to buy") are found
+SCAN_OVERLAP = 64
+
+class ConversationState(NamedTuple):
+    offset: int
+    tail: str
+    signals: FrozenSet[str]
+    # blake2b of the scanned text (chat_history[:offset])
+    digest: str
+
+def _hasher(text: str):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16)
+
+class ConversationScanner:
+    """
+    Incremental signal scanning for chat histories that only grow.
+
+    Per conversation id it keeps the signals found so far and how much of the
+    history they cover; a later call only scans the new text (plus the last
+    SCAN_OVERLAP characters), so the signal scan per message stays flat
+    however long the thread gets. The earlier text is only hashed, to check
+    it against a digest of what was scanned: if the history no longer
+    extends it (edited, truncated or a different conversation) it is
+    rescanned in full.
+    States live in an LRU of `max_size` conversations; with a `path` they are
+    also persisted to SQLite and reloaded on a cache miss, so they survive
+    restarts and LRU eviction. Writes are batched by a background thread
+    every `flush_interval` seconds rather than made by the scoring request;
+    states not yet flushed when the process dies only cost a full rescan.
+    """
+
+    def __init__(
+        self,
+        scanner: SignalScanner = SCANNER,
+        max_size: int = config.SCORING_STATE_CACHE_SIZE,
+        path: Optional[str] = config.SCORING_STATE_PATH or None,
+        flush_interval: float = config.SCORING_STATE_FLUSH_INTERVAL
+    ):
+        self.scanner = scanner
+        self.max_size = max(1, max_size)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        # States changed since the last flush (kept here even if the LRU evicts them)
+        self._dirty: Dict[str, ConversationState] = {}
+        # _lock guards the in-memory states; _db_lock the connection (always taken first)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    conversation_id TEXT PRIMARY KEY,
+                    scanned_offset INTEGER NOT NULL,
+                    tail TEXT NOT NULL,
+                    signals TEXT NOT NULL,
+                    digest TEXT NOT NULL DEFAULT ''
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(conversation_state)")}
+            if 'digest' not in columns:
+                # States saved before digests; an empty digest never matches, so they are rescanned once
+                self._conn.execute("ALTER TABLE conversation_state ADD COLUMN digest TEXT NOT NULL DEFAULT ''")
+            self._conn.commit()
+            self._flusher = threading.Thread(target=self._flush_loop, name="scoring-state-flush", daemon=True)
+            self._flusher.start()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def scan(self, conversation_id: str, chat_history: str) -> FrozenSet[str]:
+        """Return the signals in chat_history, scanning only what is new since the last call"""
+        state = self._get(conversation_id)
+        hasher = self._scanned_prefix(state, chat_history) if state is not None else None
+        if hasher is not None:
+            if len(chat_history) == state.offset:
+                return state.signals
+            start = max(0, state.offset - SCAN_OVERLAP)
+            signals = state.signals | self.scanner.scan(chat_history[start:])
+            hasher.update(chat_history[state.offset:].encode('utf-8', 'surrogatepass'))
+        else:
+            signals = self.scanner.scan(chat_history)
+            hasher = _hasher(chat_history)
+        self._put(conversation_id, ConversationState(len(chat_history), chat_history[-SCAN_OVERLAP:], signals, hasher.hexdigest()))
+        return signals
+
+    def reset(self, conversation_id: str):
+        with self._db_lock:
+            with self._lock:
+                self._states.pop(conversation_id, None)
+                self._dirty.pop(conversation_id, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM conversation_state WHERE conversation_id = ?", (conversation_id,))
+                self._conn.commit()
+
+    def flush(self):
+        """Write the states changed since the last flush in one transaction"""
+        with self._db_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if self._conn is None or not dirty:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO conversation_state (conversation_id, scanned_offset, tail, signals, digest) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (conversation_id, state.offset, state.tail, json.dumps(sorted(state.signals)), state.digest)
+                        for conversation_id, state in dirty.items()
+                    ]
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Failed to persist {len(dirty)} scoring states: {e}")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    @staticmethod
+    def _scanned_prefix(state: ConversationState, chat_history: str):
+        """Hasher over the already-scanned part of chat_history, or None if the history doesn't extend the state"""
+        if len(chat_history) < state.offset:
+            return None
+        # The tail is a cheap early reject; the digest covers the whole scanned text
+        if chat_history[state.offset - len(state.tail):state.offset] != state.tail:
+            return None
+        hasher = _hasher(chat_history[:state.offset])
+        return hasher if hasher.hexdigest() == state.digest else None
+
+    def _get(self, conversation_id: str) -> Optional[ConversationState]:
+        with self._lock:
+            state = self._states.get(conversation_id) or self._dirty.get(conversation_id)
+            if state is not None:
+                self._remember(conversation_id, state)
+                return state
+        if self._conn is None:
+            return None
+        with self._db_lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT scanned_offset, tail, signals, digest FROM conversation_state WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            # A newer state may have been put while reading
+            state = self._states.get(conversation_id) or ConversationState(row[0], row[1], frozenset(json.loads(row[2])), row[3])
+            self._remember(conversation_id, state)
+            return state
+
+    def _put(self, conversation_id: str, state: ConversationState):
+        with self._lock:
+            self._remember(conversation_id, state)
+            if self._conn is not None:
+                self._dirty[conversation_id] = state
+
+    def _remember(self, conversation_id: str, state: ConversationState):
+        self._states[conversation_id] = state
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_conversations: Optional[ConversationScanner] = None
+_conversations_lock = threading.Lock()
+
+def get_conversation_scanner() -> ConversationScanner:
+    """Process-wide ConversationScanner, created on first use"""
+    global _conversations
+    with _conversations_lock:
+        if _conversations is None:
+            _conversations = ConversationScanner()
+            logger.info(f"Incremental scoring state: LRU of {_conversations.max_size} conversations, persistence {_conversations.path or 'off'}")
+        return _conversations
+
+def scan_chat(chat_history: str, conversation_id: Optional[str] = None) -> FrozenSet[str]:
+    """Signals in a chat history; incremental when the conversation id is known"""
+    if conversation_id:
+        return get_conversation_scanner().scan(conversation_id, chat_history)
+    return scan_signals(chat_history)
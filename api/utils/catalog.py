@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from api.env_config import config
+
+logger = logging.getLogger(__name__)
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+class _Snapshot(NamedTuple):
+    signature: Signature
+    value: Any
+
+
+def parse_listings(content: str) -> List[Dict[str, Any]]:
+    """Parse a catalog file holding either a JSON list or {"listings": [...]}"""
+    content = content.strip()
+    if not content:
+        return []
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = data.get("listings", [])
+    return data
+
+
+def _file_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class CatalogLoader:
+    """
+    Cached, hot-reloading view of a listings file.
+
+    The parsed catalog (optionally passed through `build`, e.g. to construct a
+    ListingsIndex) is held in an immutable snapshot. Readers poll the file's
+    mtime/inode/size at most once per `poll_interval`; when it changes, a
+    background thread parses the new file and swaps the snapshot reference,
+    so readers never wait on a reload and keep the previous catalog until the
+    new one is ready. A file that fails to parse (e.g. caught mid-write) is
+    logged and retried on the next poll.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        build: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        fallback: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        poll_interval: float = config.LISTINGS_RELOAD_INTERVAL
+    ):
+        self.path = Path(path)
+        self.build = build
+        self.fallback = fallback
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Return the current catalog, scheduling a reload if the file changed"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load(_file_signature(self.path))
+                    self._last_poll = time.monotonic()
+            return self._snapshot.value
+
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            signature = _file_signature(self.path)
+            if signature != snapshot.signature and self._lock.acquire(blocking=False):
+                threading.Thread(target=self._reload, args=(signature,), daemon=True).start()
+        return snapshot.value
+
+    def refresh(self) -> Any:
+        """Synchronously reload the catalog if the file changed"""
+        with self._lock:
+            signature = _file_signature(self.path)
+            if self._snapshot is None or signature != self._snapshot.signature:
+                self._snapshot = self._load(signature)
+        return self._snapshot.value
+
+    def _reload(self, signature: Signature):
+        try:
+            self._snapshot = self._load(signature)
+            logger.info(f"Reloaded listings catalog from {self.path}")
+        except Exception as e:
+            logger.warning(f"Keeping previous listings catalog, failed to reload {self.path}: {e}")
+        finally:
+            self._lock.release()
+
+    def _load(self, signature: Signature) -> _Snapshot:
+        listings: List[Dict[str, Any]] = []
+        if signature is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                listings = parse_listings(f.read())
+        if not listings and self.fallback is not None:
+            listings = self.fallback()
+        value = self.build(listings) if self.build is not None else listings
+        return _Snapshot(signature, value)
+
+
+_catalogs: Dict[Tuple[str, Any], CatalogLoader] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(
+    path: Union[str, Path],
+    build: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    fallback: Optional[Callable[[], List[Dict[str, Any]]]] = None
+) -> CatalogLoader:
+    """Return the process-wide loader for `path` (one per path/build pair)"""
+    key = (str(Path(path).resolve()), build)
+    with _catalogs_lock:
+        loader = _catalogs.get(key)
+        if loader is None:
+            loader = _catalogs[key] = CatalogLoader(path, build=build, fallback=fallback)
+        return loader
@@ -1,31 +1,103 @@
-import json
-from typing import List, Dict
-import os
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+import numpy as np
+
+from api.utils.catalog import get_catalog
+from api.utils.listings_index import ListingsIndex
+
+LISTINGS_PATH = Path(__file__).parent.parent.parent / "listings.json"
+
+# Relative weight of each criterion in the relevance score (only criteria present in the intent count)
+MATCH_WEIGHTS = {
+    'price': 0.4,
+    'type': 0.3,
+    'bedrooms': 0.3,
+}
+
+def get_listings_index() -> ListingsIndex:
+    """Return the index over the cached listings catalog, rebuilt when the JSON file changes"""
+    return get_catalog(LISTINGS_PATH, build=ListingsIndex).get()
+
 def load_listings() -> List[Dict]:
-    """Load listings from the JSON file"""
-    listings_path = Path(__file__).parent.parent.parent / "listings.json"
+    """Return the cached listings catalog, reloaded when the JSON file changes"""
+    return get_listings_index().listings
+
+def _positive_number(value: Any) -> Optional[float]:
     try:
-        with open(listings_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+def price_closeness(prices: np.ndarray, target_price: float) -> np.ndarray:
+    """1.0 at the target price, falling linearly to 0.0 at 100% away from it"""
+    return np.clip(1.0 - np.abs(prices - target_price) / target_price, 0.0, 1.0)
+
+def bedroom_proximity(bedrooms: np.ndarray, target_bedrooms: float) -> np.ndarray:
+    """1.0 for an exact bedroom count, 1/2 for one off, 1/3 for two off, ..."""
+    return 1.0 / (1.0 + np.abs(bedrooms - target_bedrooms))
+
+def rank_listings(index: ListingsIndex, intent: Dict, limit: int = 3) -> List[int]:
+    """
+    Score every listing against the intent in one vectorized pass and
+    return the catalog positions of the `limit` most relevant, best first.
+
+    Location is a hard constraint; price, type and bedrooms contribute a
+    weighted relevance score, and when any of them is given listings that
+    match none of them are dropped. An intent with no criteria at all (such
+    as the pipeline's fallback intent) matches nothing. Ties keep catalog
+    order.
+    """
+    if len(index) == 0 or limit <= 0:
+        return []
+
+    budget = _positive_number(intent.get('budget'))
+    bedrooms = _positive_number(intent.get('bedrooms'))
+    location = (intent.get('location') or '').strip()
+    property_type = (intent.get('type') or '').strip()
+
+    scores = np.zeros(len(index), dtype=np.float64)
+    total_weight = 0.0
+    if budget:
+        scores += MATCH_WEIGHTS['price'] * price_closeness(index.price.values, budget)
+        total_weight += MATCH_WEIGHTS['price']
+    if property_type:
+        type_match = np.zeros(len(index), dtype=np.float64)
+        type_match[index.type.contains(property_type)] = 1.0
+        scores += MATCH_WEIGHTS['type'] * type_match
+        total_weight += MATCH_WEIGHTS['type']
+    if bedrooms:
+        scores += MATCH_WEIGHTS['bedrooms'] * bedroom_proximity(index.bedrooms.values, bedrooms)
+        total_weight += MATCH_WEIGHTS['bedrooms']
+    if not total_weight and not location:
+        return []
+    if total_weight:
+        scores /= total_weight
+
+    candidates = index.location.contains(location) if location else np.arange(len(index), dtype=np.int64)
+    if total_weight:
+        candidates = candidates[scores[candidates] > 0]
+    if candidates.size == 0:
         return []
 
-def price_within_range(listing_price: float, target_price: float, tolerance: float = 0.1) -> bool:
-    """Check if listing price is within ±10% of target price"""
-    lower_bound = target_price * (1 - tolerance)
-    upper_bound = target_price * (1 + tolerance)
-    return lower_bound <= listing_price <= upper_bound
+    candidate_scores = scores[candidates]
+    if candidates.size > limit:
+        # Partial selection of the limit-th best score, then fill any ties at that score in catalog order
+        kth = np.partition(candidate_scores, candidates.size - limit)[candidates.size - limit]
+        above = candidate_scores > kth
+        ties = np.flatnonzero(candidate_scores == kth)[:limit - int(above.sum())]
+        top = np.concatenate([np.flatnonzero(above), ties])
+        candidates, candidate_scores = candidates[top], candidate_scores[top]
 
-def location_matches(listing_location: str, target_location: str) -> bool:
-    """Check if locations match (case-insensitive partial match)"""
-    return target_location.lower() in listing_location.lower()
+    # Best score first, catalog order among equal scores
+    order = np.lexsort((candidates, -candidate_scores))
+    return candidates[order].tolist()
 
-def filter_listings(intent: Dict) -> List[Dict]:
+def filter_listings(intent: Dict, limit: int = 3) -> List[Dict]:
     """
-    Filter listings based on intent parameters
-    
+    Rank listings against intent parameters
+
     Args:
         intent: Dict containing:
             - intent (buy/rent/book)
@@ -33,46 +105,18 @@ def filter_listings(intent: Dict) -> List[Dict]:
             - location (str)
             - bedrooms (int)
             - type (str)
-    
+        limit: Maximum number of listings to return
+
     Returns:
-        List of matching listings (max 3)
+        List of the best matching listings (max `limit`), best first
     """
-    listings = load_listings()
-    if not listings:
-        return []
-
-    # Extract criteria from intent
-    budget = intent.get('budget')
-    location = intent.get('location', '').strip()
-    property_type = intent.get('type', '').lower()
-    bedrooms = intent.get('bedrooms')
-
-    filtered_listings = []
-    
-    for listing in listings:
-        # Skip if essential criteria don't match
-        if location and not location_matches(listing['location'], location):
-            continue
-            
-        if budget and not price_within_range(listing['price'], budget):
-            continue
-            
-        if property_type and property_type not in listing.get('type', '').lower():
-            continue
-            
-        if bedrooms and listing.get('bedrooms') != bedrooms:
-            continue
-            
-        # Add matching listing
-        filtered_listings.append({
+    index = get_listings_index()
+    return [
+        {
             'title': listing['title'],
             'price': listing['price'],
             'location': listing['location'],
             'image': listing.get('image', '')  # Default to empty string if no image
-        })
-        
-        # Limit to top 3 matches
-        if len(filtered_listings) >= 3:
-            break
-            
-    return filtered_listings 
\ No newline at end of file
+        }
+        for listing in (index.listings[p] for p in rank_listings(index, intent, limit))
+    ]
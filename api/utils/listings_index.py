@@ -0,0 +1,122 @@
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _numeric(value: Any) -> float:
+    """Coerce a listing field to a float, treating missing/invalid values as 0"""
+    try:
+        return float(value) if value is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class _TextColumn:
+    """Lower-cased text column with an inverted token -> positions map"""
+
+    def __init__(self, values: List[str]):
+        self.values = [value.lower() for value in values]
+        postings: Dict[str, List[int]] = {}
+        for position, value in enumerate(self.values):
+            for token in set(_tokenize(value)):
+                postings.setdefault(token, []).append(position)
+        self.postings = {token: np.asarray(positions, dtype=np.int64) for token, positions in postings.items()}
+
+    def contains(self, query: str) -> np.ndarray:
+        """
+        Positions whose value contains `query` as a case-insensitive substring.
+
+        The inverted map narrows the candidates to values sharing every query
+        token (a query token may be a fragment of an indexed token, e.g.
+        "mari" -> "marina"), then the exact substring check runs on those
+        candidates only. Cost is O(vocabulary + k) rather than O(n).
+        """
+        needle = query.lower()
+        tokens = _tokenize(needle)
+        if not tokens:
+            candidates = np.arange(len(self.values), dtype=np.int64)
+        else:
+            candidates = None
+            for token in tokens:
+                matching = [positions for indexed, positions in self.postings.items() if token in indexed]
+                if not matching:
+                    return np.empty(0, dtype=np.int64)
+                hits = np.unique(np.concatenate(matching))
+                candidates = hits if candidates is None else np.intersect1d(candidates, hits, assume_unique=True)
+                if candidates.size == 0:
+                    return candidates
+        return np.asarray([p for p in candidates.tolist() if needle in self.values[p]], dtype=np.int64)
+
+
+class _RangeColumn:
+    """Numeric column held sorted (with its original positions) for range queries"""
+
+    def __init__(self, values: List[float]):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.order = np.argsort(self.values, kind='stable')
+        self.sorted = self.values[self.order]
+
+    def between(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """Positions with low <= value <= high, in O(log n + k)"""
+        start = 0 if low is None else int(np.searchsorted(self.sorted, low, side='left'))
+        end = len(self.sorted) if high is None else int(np.searchsorted(self.sorted, high, side='right'))
+        return self.order[start:end]
+
+
+class ListingsIndex:
+    """
+    Columnar, read-only index over a listings catalog.
+
+    Price and bedrooms are kept as sorted NumPy columns so range filters are
+    binary searches; location and type are kept as inverted token maps. A
+    query intersects the per-filter position sets, smallest first, and
+    returns listings in their original catalog order.
+    """
+
+    def __init__(self, listings: List[Dict[str, Any]]):
+        self.listings = listings
+        self.price = _RangeColumn([_numeric(l.get('price', 0)) for l in listings])
+        self.bedrooms = _RangeColumn([_numeric(l.get('bedrooms', 0)) for l in listings])
+        self.location = _TextColumn([str(l.get('location') or '') for l in listings])
+        self.type = _TextColumn([str(l.get('type') or '') for l in listings])
+
+    def __len__(self) -> int:
+        return len(self.listings)
+
+    def search(
+        self,
+        budget: Optional[float] = None,
+        min_price: Optional[float] = None,
+        location: Optional[str] = None,
+        bedrooms: Optional[int] = None,
+        property_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return listings matching every given filter (falsy filters are ignored)"""
+        selections = []
+        if budget or min_price:
+            selections.append(self.price.between(min_price or None, budget or None))
+        if bedrooms:
+            selections.append(self.bedrooms.between(low=bedrooms))
+        if location:
+            selections.append(self.location.contains(location))
+        if property_type:
+            selections.append(self.type.contains(property_type))
+
+        if not selections:
+            return list(self.listings)
+
+        selections.sort(key=len)
+        positions = np.sort(selections[0])
+        for selection in selections[1:]:
+            if positions.size == 0:
+                break
+            positions = np.intersect1d(positions, selection, assume_unique=True)
+
+        return [self.listings[p] for p in positions.tolist()]
@@ -0,0 +1,108 @@
+import logging
+from typing import Optional
+
+import httpx
+
+try:
+    from ..env_config import config
+except ImportError:
+    # Fallback imports for development
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from env_config import config
+
+# HTTP/2 needs the h2 package (httpx[http2]); without it the pool falls back to HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _create_http_client() -> httpx.AsyncClient:
+    http2 = config.WHATSAPP_HTTP2 and HTTP2_AVAILABLE
+    if config.WHATSAPP_HTTP2 and not HTTP2_AVAILABLE:
+        logger.warning("h2 is not installed, WhatsApp API client falls back to HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(config.WHATSAPP_HTTP_TIMEOUT, connect=config.WHATSAPP_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=config.WHATSAPP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.WHATSAPP_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=config.WHATSAPP_HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    The shared, pooled client for the WhatsApp Cloud API. Opened by the app's
+    startup event (or lazily on first use outside the app) and closed on
+    shutdown, so consecutive sends reuse warm connections instead of paying
+    a TCP + TLS handshake each.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+async def open_http_client():
+    get_http_client()
+
+async def close_http_client():
+    global _http_client
+    client, _http_client = _http_client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+# WhatsApp API client
+class WhatsAppClient:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.api_key = getattr(config, "WHATSAPP_API_KEY", "test_key")
+        self.phone_number_id = getattr(config, "WHATSAPP_PHONE_NUMBER_ID", "test_id")
+        self.base_url = f"{config.WHATSAPP_API_URL.rstrip('/')}/{self.phone_number_id}"
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    async def post_message(self, to: str, message: str) -> httpx.Response:
+        """POST a text message and return the API response (transport errors propagate)"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": message}
+        }
+        return await self.http_client.post(f"{self.base_url}/messages", headers=headers, json=payload)
+
+    async def send_message(self, to: str, message: str) -> bool:
+        """Send a text message via WhatsApp API"""
+        try:
+            response = await self.post_message(to, message)
+            if response.status_code == 200:
+                logger.info(f"Message sent to {to}")
+                return True
+            else:
+                logger.error(f"Failed to send message: {response.text}")
+                return False
+        except Exception as e:
+            logger.error(f"Error sending WhatsApp message: {str(e)}")
+            return False
+
+_whatsapp_client: Optional[WhatsAppClient] = None
+
+# Get WhatsApp client
+def get_whatsapp_client() -> WhatsAppClient:
+    global _whatsapp_client
+    if _whatsapp_client is None:
+        _whatsapp_client = WhatsAppClient()
+    return _whatsapp_client
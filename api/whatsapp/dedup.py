@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    from ..env_config import config
+except ImportError:
+    # Fallback imports for development
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from env_config import config
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are purged from disk once per this many recorded messages
+PURGE_EVERY = 1000
+
+def dedup_key(payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Identity of a webhook delivery: WhatsApp's message id when present,
+    otherwise a hash of the raw payload (a redelivery carries the same body,
+    including sender and timestamp). Without a message id or a timestamp a
+    redelivery can't be told from the same text sent again, so None is
+    returned and the delivery is not deduplicated.
+    """
+    message_id = payload.get("message_id")
+    if message_id:
+        return f"id:{message_id}"
+    if not payload.get("timestamp"):
+        return None
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f"sha256:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+class SeenMessages:
+    """
+    Bounded TTL set of webhook deliveries already accepted.
+
+    `check_and_add` records a key and tells whether it was already seen
+    within `ttl` seconds, or `hash_ttl` for payload-hash keys, which only
+    need to outlast WhatsApp's redelivery retries. Keys live in an LRU of `max_size`; with a `path`
+    they are also recorded in SQLite, whose upsert makes the check atomic
+    across web workers and keeps replays recognized after a restart.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.WHATSAPP_DEDUP_TTL,
+        hash_ttl: float = config.WHATSAPP_DEDUP_HASH_TTL,
+        max_size: int = config.WHATSAPP_DEDUP_CACHE_SIZE,
+        path: Optional[str] = config.WHATSAPP_DEDUP_PATH or None
+    ):
+        self.ttl = ttl
+        self.hash_ttl = hash_ttl
+        self.max_size = max(1, max_size)
+        self.path = path
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_messages (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def check_and_add(self, key: str) -> bool:
+        """True if `key` was seen within the TTL (a replay); otherwise record it and return False"""
+        now = time.time()
+        ttl = self.hash_ttl if key.startswith("sha256:") else self.ttl
+        with self._lock:
+            expires_at = self._expires.get(key)
+            if expires_at is not None and expires_at > now:
+                self._expires.move_to_end(key)
+                return True
+            if self._conn is not None:
+                # Inserts, or revives an expired row; touches nothing if a live row exists
+                cursor = self._conn.execute(
+                    "INSERT INTO seen_messages (key, expires_at) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at WHERE seen_messages.expires_at <= ?",
+                    (key, now + ttl, now)
+                )
+                if cursor.rowcount == 0:
+                    self._remember(key, self._conn.execute(
+                        "SELECT expires_at FROM seen_messages WHERE key = ?", (key,)
+                    ).fetchone()[0])
+                    return True
+                self._recorded += 1
+                if self._recorded % PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (now,))
+            self._remember(key, now + ttl)
+            return False
+
+    def forget(self, key: str):
+        """Drop a key, so a redelivery is processed (e.g. when accepting the message failed)"""
+        with self._lock:
+            self._expires.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM seen_messages WHERE key = ?", (key,))
+
+    def _remember(self, key: str, expires_at: float):
+        self._expires[key] = expires_at
+        self._expires.move_to_end(key)
+        while len(self._expires) > self.max_size:
+            self._expires.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_seen_messages: Optional[SeenMessages] = None
+_seen_messages_lock = threading.Lock()
+
+def get_seen_messages() -> SeenMessages:
+    """Process-wide SeenMessages, created on first use"""
+    global _seen_messages
+    with _seen_messages_lock:
+        if _seen_messages is None:
+            _seen_messages = SeenMessages()
+        return _seen_messages
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+try:
+    from ..env_config import config
+except ImportError:
+    # Fallback imports for development
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from env_config import config
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+FAILED = 'failed'
+
+class InboundQueueFull(Exception):
+    """Raised when the backlog of unprocessed webhook messages is at its limit"""
+
+class InboundMessage(NamedTuple):
+    id: int
+    payload: Dict[str, Any]
+    attempts: int
+
+def conversation_of(payload: Dict[str, Any]) -> str:
+    return str(payload.get("from", ""))
+
+class InboundStore:
+    """
+    SQLite (WAL) queue of received webhook messages, shared by the web
+    workers that enqueue and the consumers that process them, which may run
+    in other processes.
+
+    Messages are grouped into per-conversation mailboxes (the sender's
+    number). A claim leases a whole mailbox, and only once the conversation
+    has gone quiet for `debounce` seconds (or its oldest message has waited
+    `max_delay`), so rapid-fire messages are answered as one turn. A
+    conversation with a leased or backing-off message is never claimed
+    again until that finishes, which keeps turns in order even across
+    consumer processes. A lease whose consumer died mid-processing expires
+    after `lease_timeout`. Processed messages are deleted; messages that
+    kept failing stay behind as `failed`. Calls block on SQLite, so async
+    callers run them in an executor; the connection is shared between those
+    threads under a lock.
+    """
+
+    def __init__(
+        self,
+        path: str = config.WHATSAPP_INBOUND_PATH,
+        lease_timeout: float = config.WHATSAPP_INBOUND_LEASE_TIMEOUT,
+        debounce: float = config.WHATSAPP_INBOUND_DEBOUNCE,
+        max_delay: float = config.WHATSAPP_INBOUND_MAX_DELAY
+    ):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self._lock = threading.Lock()
+        # Autocommit; claims take an explicit write lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL survives process crashes without an fsync per enqueue
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS inbound_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                received_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(inbound_messages)")}
+        if 'conversation' not in columns:
+            # Queues created before per-conversation mailboxes
+            self._conn.execute("ALTER TABLE inbound_messages ADD COLUMN conversation TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("UPDATE inbound_messages SET conversation = COALESCE(json_extract(payload, '$.from'), '')")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS inbound_status ON inbound_messages (status, available_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS inbound_conversation ON inbound_messages (conversation, id)")
+
+    def enqueue(self, payload: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO inbound_messages (conversation, payload, status, available_at, received_at) VALUES (?, ?, ?, ?, ?)",
+                (conversation_of(payload), json.dumps(payload), PENDING, now, now)
+            )
+            return cursor.lastrowid
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM inbound_messages WHERE status IN (?, ?)", (PENDING, PROCESSING)
+            ).fetchone()[0]
+
+    def claim(self) -> List[InboundMessage]:
+        """Lease the mailbox of the longest-waiting ready conversation (oldest message first)"""
+        with self._lock:
+            return self._claim(time.time())
+
+    def _claim(self, now: float) -> List[InboundMessage]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                """
+                SELECT conversation FROM inbound_messages
+                WHERE status IN (?, ?)
+                GROUP BY conversation
+                HAVING MAX(available_at) <= ? AND (MAX(received_at) <= ? OR MIN(received_at) <= ?)
+                ORDER BY MIN(id) LIMIT 1
+                """,
+                (PENDING, PROCESSING, now, now - self.debounce, now - self.max_delay)
+            ).fetchone()
+            rows = []
+            if row is not None:
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts FROM inbound_messages WHERE conversation = ? AND status IN (?, ?) ORDER BY id",
+                    (row[0], PENDING, PROCESSING)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE inbound_messages SET status = ?, available_at = ? WHERE id = ?",
+                    [(PROCESSING, now + self.lease_timeout, message_id) for message_id, _, _ in rows]
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return [InboundMessage(message_id, json.loads(payload), attempts) for message_id, payload, attempts in rows]
+
+    def next_ready(self) -> Optional[float]:
+        """When the next conversation becomes claimable (wall clock), if any is waiting"""
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT MIN(ready) FROM (
+                    SELECT MAX(MAX(available_at), MIN(MAX(received_at) + ?, MIN(received_at) + ?)) AS ready
+                    FROM inbound_messages WHERE status IN (?, ?) GROUP BY conversation
+                )
+                """,
+                (self.debounce, self.max_delay, PENDING, PROCESSING)
+            ).fetchone()[0]
+
+    def complete(self, messages: List[InboundMessage]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM inbound_messages WHERE id = ?", [(message.id,) for message in messages])
+
+    def release(self, messages: List[InboundMessage]):
+        """Hand leased messages back untouched (e.g. on shutdown)"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE inbound_messages SET status = ?, available_at = ? WHERE id = ?",
+                [(PENDING, time.time(), message.id) for message in messages]
+            )
+
+    def retry(self, messages: List[InboundMessage], delay: float, error: str):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE inbound_messages SET status = ?, attempts = ?, available_at = ?, last_error = ? WHERE id = ?",
+                [(PENDING, message.attempts + 1, time.time() + delay, error, message.id) for message in messages]
+            )
+
+    def fail(self, messages: List[InboundMessage], error: str):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE inbound_messages SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                [(FAILED, message.attempts + 1, error, message.id) for message in messages]
+            )
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, PROCESSING: 0, FAILED: 0}
+        with self._lock:
+            counts.update(dict(self._conn.execute("SELECT status, COUNT(*) FROM inbound_messages GROUP BY status")))
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class InboundConsumer:
+    """
+    Pool of `concurrency` workers draining the InboundStore through
+    `handler(payloads)`, one conversation turn (all messages the mailbox
+    held) per call; a conversation is handled by one worker at a time.
+
+    Workers in the same process as the webhook are woken on enqueue; others
+    poll every `poll_interval`. A handler exception is retried with
+    exponential backoff, up to `max_attempts`, then the turn's messages are
+    marked failed and `on_failure(payloads)` is called. Run it inside the API (WHATSAPP_INBOUND_CONSUMERS_IN_APP) or as
+    its own process with `python -m api.whatsapp.inbound`, so AI processing
+    scales independently of the HTTP tier.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        store: Optional[InboundStore] = None,
+        concurrency: int = config.WHATSAPP_INBOUND_CONCURRENCY,
+        max_attempts: int = config.WHATSAPP_INBOUND_MAX_ATTEMPTS,
+        poll_interval: float = config.WHATSAPP_INBOUND_POLL_INTERVAL,
+        on_failure: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None
+    ):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.store = store or get_inbound_store()
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self.processed = 0
+        self.turns = 0
+        self.failed = 0
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self):
+        if not self._workers:
+            loop = asyncio.get_running_loop()
+            self._workers = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Cancel the workers, handing the messages they were processing back to the queue"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def run(self):
+        self.start()
+        await asyncio.gather(*self._workers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "turns": self.turns,
+            "failed": self.failed,
+            **self.store.counts()
+        }
+
+    async def _work(self):
+        while True:
+            # Cleared before claiming, so an enqueue racing the claim still wakes us
+            self._wake.clear()
+            messages = await self._run(self.store.claim)
+            if not messages:
+                next_ready = await self._run(self.store.next_ready)
+                timeout = self.poll_interval
+                if next_ready is not None:
+                    timeout = min(max(next_ready - time.time(), 0.0), timeout)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(messages)
+            # Messages that arrived for this conversation meanwhile are claimable now
+            self._wake.set()
+
+    @staticmethod
+    async def _run(func: Callable[..., Any], *args) -> Any:
+        """Run a store call off the event loop (it can wait on another writer's lock)"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _process(self, messages: List[InboundMessage]):
+        attempts = max(message.attempts for message in messages)
+        try:
+            await self.handler([message.payload for message in messages])
+        except asyncio.CancelledError:
+            await self._run(self.store.release, messages)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            ids = ', '.join(str(message.id) for message in messages)
+            if attempts + 1 < self.max_attempts:
+                delay = min(60.0, 2 ** attempts) * random.uniform(0.5, 1.0)
+                await self._run(self.store.retry, messages, delay, error)
+                logger.warning(f"Retrying inbound messages {ids} in {delay:.1f}s: {error}")
+            else:
+                await self._run(self.store.fail, messages, error)
+                self.failed += len(messages)
+                logger.error(f"Inbound messages {ids} failed after {attempts + 1} attempts: {error}")
+                if self.on_failure is not None:
+                    try:
+                        await self.on_failure([message.payload for message in messages])
+                    except Exception as e:
+                        logger.error(f"Failure handler for inbound messages {ids} failed: {e}")
+            return
+        await self._run(self.store.complete, messages)
+        self.processed += len(messages)
+        self.turns += 1
+
+_inbound_store: Optional[InboundStore] = None
+_inbound_consumer: Optional[InboundConsumer] = None
+
+def get_inbound_store() -> InboundStore:
+    global _inbound_store
+    if _inbound_store is None:
+        _inbound_store = InboundStore()
+    return _inbound_store
+
+# Backlog size as last counted, so the webhook doesn't run a COUNT per request
+_backlog = (0.0, 0)
+BACKLOG_CHECK_INTERVAL = 1.0
+
+async def enqueue_inbound(payload: Dict[str, Any]) -> int:
+    """Persist a webhook message for the consumers (raises InboundQueueFull past the backlog limit)"""
+    global _backlog
+    loop = asyncio.get_running_loop()
+    store = get_inbound_store()
+    if config.WHATSAPP_INBOUND_MAX_PENDING:
+        checked_at, backlog = _backlog
+        if time.monotonic() - checked_at >= BACKLOG_CHECK_INTERVAL:
+            backlog = await loop.run_in_executor(None, store.pending)
+            _backlog = (time.monotonic(), backlog)
+        if backlog >= config.WHATSAPP_INBOUND_MAX_PENDING:
+            raise InboundQueueFull(f"{backlog} inbound messages are waiting to be processed")
+    message_id = await loop.run_in_executor(None, store.enqueue, payload)
+    if _inbound_consumer is not None:
+        _inbound_consumer.notify()
+    return message_id
+
+def coalesce(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge one conversation's queued messages into a single message (texts joined in order)"""
+    if len(payloads) == 1:
+        return payloads[0]
+    merged = dict(payloads[-1])
+    merged["message"] = "\n".join(str(payload.get("message", "")) for payload in payloads if payload.get("message"))
+    merged["name"] = next((payload["name"] for payload in reversed(payloads) if payload.get("name")), "")
+    return merged
+
+async def handle_inbound(payloads: List[Dict[str, Any]]):
+    """Answer one conversation turn; errors propagate so the consumer retries the turn"""
+    # Imported here to avoid circular imports (the router enqueues into this module)
+    try:
+        from .router import reply_to_message
+        from .schemas import WhatsAppMessage
+    except ImportError:
+        from whatsapp.router import reply_to_message
+        from whatsapp.schemas import WhatsAppMessage
+    await reply_to_message(WhatsAppMessage(**coalesce(payloads)))
+
+async def handle_inbound_failure(payloads: List[Dict[str, Any]]):
+    """Holding reply once a turn has failed its last attempt"""
+    try:
+        from .router import send_fallback_reply
+    except ImportError:
+        from whatsapp.router import send_fallback_reply
+    send_fallback_reply(conversation_of(payloads[-1]))
+
+def get_inbound_consumer() -> InboundConsumer:
+    global _inbound_consumer
+    if _inbound_consumer is None:
+        _inbound_consumer = InboundConsumer(handle_inbound, on_failure=handle_inbound_failure)
+    return _inbound_consumer
+
+async def start_inbound_consumers():
+    if config.WHATSAPP_INBOUND_CONSUMERS_IN_APP:
+        get_inbound_consumer().start()
+
+async def stop_inbound_consumers():
+    if _inbound_consumer is not None:
+        await _inbound_consumer.stop()
+
+if __name__ == "__main__":
+    # Standalone consumer pool; replies land in the outbound queue, which the API process dispatches
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL.upper(), logging.INFO))
+    asyncio.run(get_inbound_consumer().run())
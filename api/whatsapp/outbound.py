@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import httpx
+
+try:
+    from ..env_config import config
+    from .client import WhatsAppClient, get_whatsapp_client
+except ImportError:
+    # Fallback imports for development
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from env_config import config
+    from whatsapp.client import WhatsAppClient, get_whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+
+# Throttling and server-side failures are retried; any other 4xx won't succeed on retry
+RETRY_STATUSES = frozenset({408, 409, 425, 429})
+
+# Seconds between deletions of sent messages past their retention
+PRUNE_INTERVAL = 3600.0
+
+class OutboundMessage(NamedTuple):
+    id: int
+    recipient: str
+    body: str
+    attempts: int
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+class OutboundStore:
+    """
+    SQLite store of outbound messages. A message is pending until sent, and
+    ends up either sent or dead (the dead-letter store, with its last error).
+    Only the oldest unsent message of each recipient is ever handed out, so
+    per-recipient order holds across retries and restarts.
+
+    Claims are leased, as in InboundStore: a claimed message is `sending`
+    until `sending_until`, and only a dispatcher that died mid-send lets
+    the lease expire, after which the message is handed out again
+    (at-least-once delivery). Claims take SQLite's write lock, so several
+    processes can share the store without claiming the same row.
+
+    Sent messages are kept for `sent_retention` seconds (then removed by
+    `prune_sent`), or deleted right away when it is 0.
+    """
+
+    def __init__(
+        self,
+        path: str = config.WHATSAPP_OUTBOUND_PATH,
+        lease_timeout: float = config.WHATSAPP_SEND_LEASE_TIMEOUT,
+        sent_retention: float = config.WHATSAPP_SENT_RETENTION_DAYS * 86400
+    ):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.sent_retention = sent_retention
+        # Autocommit; claims take an explicit write lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbound_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbound_messages)")}
+        if 'sending_until' not in columns:
+            # Stores created before leased claims; their `sending` rows count as expired
+            self._conn.execute("ALTER TABLE outbound_messages ADD COLUMN sending_until REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbound_status ON outbound_messages (status, recipient, id)")
+
+    def enqueue(self, recipient: str, body: str) -> int:
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT INTO outbound_messages (recipient, body, status, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (recipient, body, PENDING, now, now, now)
+        )
+        return cursor.lastrowid
+
+    def claim(self, limit: int) -> List[OutboundMessage]:
+        """Lease due head-of-line messages (and expired leases) and return them, oldest first"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                """
+                SELECT id, recipient, body, attempts FROM outbound_messages
+                WHERE id IN (
+                    SELECT MIN(id) FROM outbound_messages WHERE status IN (?, ?) GROUP BY recipient
+                ) AND (
+                    (status = ? AND next_attempt_at <= ?) OR (status = ? AND sending_until <= ?)
+                )
+                ORDER BY id LIMIT ?
+                """,
+                (PENDING, SENDING, PENDING, now, SENDING, now, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE outbound_messages SET status = ?, sending_until = ?, updated_at = ? WHERE id = ?",
+                [(SENDING, now + self.lease_timeout, now, row[0]) for row in rows]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return [OutboundMessage(*row) for row in rows]
+
+    def next_due(self) -> Optional[float]:
+        """When the earliest pending message becomes due, or a send lease expires (wall clock), if any"""
+        row = self._conn.execute(
+            """
+            SELECT MIN(CASE WHEN status = ? THEN next_attempt_at ELSE sending_until END)
+            FROM outbound_messages WHERE status IN (?, ?)
+            """,
+            (PENDING, PENDING, SENDING)
+        ).fetchone()
+        return row[0]
+
+    def _update(self, message_id: int, status: str, attempts: int, next_attempt_at: float = 0.0, error: Optional[str] = None):
+        self._conn.execute(
+            "UPDATE outbound_messages SET status = ?, attempts = ?, next_attempt_at = ?, updated_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, next_attempt_at, time.time(), error, message_id)
+        )
+
+    def mark_sent(self, message: OutboundMessage):
+        if self.sent_retention <= 0:
+            self._conn.execute("DELETE FROM outbound_messages WHERE id = ?", (message.id,))
+        else:
+            self._update(message.id, SENT, message.attempts + 1)
+
+    def prune_sent(self) -> int:
+        """Delete sent messages older than the retention period; returns how many"""
+        cursor = self._conn.execute(
+            "DELETE FROM outbound_messages WHERE status = ? AND updated_at < ?",
+            (SENT, time.time() - self.sent_retention)
+        )
+        return cursor.rowcount
+
+    def mark_retry(self, message: OutboundMessage, delay: float, error: str):
+        self._update(message.id, PENDING, message.attempts + 1, time.time() + delay, error)
+
+    def mark_dead(self, message: OutboundMessage, error: str):
+        self._update(message.id, DEAD, message.attempts + 1, error=error)
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT id, recipient, body, attempts, created_at, updated_at, last_error FROM outbound_messages WHERE status = ? ORDER BY id DESC LIMIT ?",
+            (DEAD, limit)
+        )
+        columns = ('id', 'recipient', 'body', 'attempts', 'created_at', 'updated_at', 'last_error')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def requeue(self, message_id: int) -> bool:
+        """Move a dead letter back into the queue with a fresh attempt count"""
+        cursor = self._conn.execute(
+            "UPDATE outbound_messages SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (PENDING, time.time(), time.time(), message_id, DEAD)
+        )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM outbound_messages GROUP BY status")
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+class OutboundQueue:
+    """
+    Durable outbound WhatsApp queue.
+
+    `enqueue` persists the message and returns at once; a dispatcher task
+    sends due messages with up to `concurrency` requests in flight, paced by
+    a token bucket of `rate` messages per second (bursts of `burst`) so
+    campaigns run at the Cloud API tier limit instead of into 429s. Each
+    recipient's messages go out strictly in order. Throttling (429, honoring
+    Retry-After), 5xx and transport errors are retried with exponential
+    backoff and jitter; after `max_attempts`, or on a non-retryable 4xx,
+    the message is moved to the dead-letter store, from where it can be
+    inspected and requeued.
+    """
+
+    def __init__(
+        self,
+        client: Optional[WhatsAppClient] = None,
+        store: Optional[OutboundStore] = None,
+        rate: float = config.WHATSAPP_SEND_RATE,
+        burst: int = config.WHATSAPP_SEND_BURST,
+        concurrency: int = config.WHATSAPP_SEND_CONCURRENCY,
+        max_attempts: int = config.WHATSAPP_SEND_MAX_ATTEMPTS,
+        backoff_base: float = config.WHATSAPP_SEND_BACKOFF_BASE,
+        backoff_max: float = config.WHATSAPP_SEND_BACKOFF_MAX
+    ):
+        self.client = client or get_whatsapp_client()
+        self.store = store or OutboundStore()
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wake = asyncio.Event()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def enqueue(self, to: str, message: str) -> int:
+        message_id = self.store.enqueue(to, message)
+        self._wake.set()
+        return message_id
+
+    def requeue(self, message_id: int) -> bool:
+        requeued = self.store.requeue(message_id)
+        self._wake.set()
+        return requeued
+
+    def start(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop dispatching and wait for in-flight sends; pending messages stay in the store"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._in_flight), **self.store.counts()}
+
+    async def _dispatch(self):
+        pruned_at = 0.0
+        while True:
+            if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned_at = time.monotonic()
+                pruned = self.store.prune_sent()
+                if pruned:
+                    logger.info(f"Pruned {pruned} sent WhatsApp messages past retention")
+            self._wake.clear()
+            free = self.concurrency - len(self._in_flight)
+            messages = self.store.claim(free) if free > 0 else []
+            for message in messages:
+                await self.bucket.acquire()
+                task = asyncio.get_running_loop().create_task(self._send(message))
+                self._in_flight.add(task)
+                task.add_done_callback(self._sent)
+            if messages:
+                continue
+            # Sleep until a send finishes, a message is enqueued or a retry becomes due
+            next_due = self.store.next_due() if free > 0 else None
+            timeout = 1.0 if next_due is None else min(max(next_due - time.time(), 0.0), 1.0)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _sent(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._wake.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _send(self, message: OutboundMessage):
+        try:
+            response = await self.client.post_message(message.recipient, message.body)
+        except httpx.TransportError as e:
+            self._failed(message, f"{type(e).__name__}: {e}", retry=True)
+            return
+        except Exception as e:
+            logger.error(f"Unexpected error sending WhatsApp message {message.id}: {e}", exc_info=True)
+            self._failed(message, str(e), retry=True)
+            return
+
+        if response.status_code == 200:
+            self.store.mark_sent(message)
+            logger.info(f"Message {message.id} sent to {message.recipient}")
+            return
+        retry = response.status_code in RETRY_STATUSES or response.status_code >= 500
+        retry_after = response.headers.get('Retry-After')
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else None
+        self._failed(message, f"HTTP {response.status_code}: {response.text[:500]}", retry, delay)
+
+    def _failed(self, message: OutboundMessage, error: str, retry: bool, delay: Optional[float] = None):
+        if retry and message.attempts + 1 < self.max_attempts:
+            delay = max(delay or 0.0, self._backoff(message.attempts))
+            self.store.mark_retry(message, delay, error)
+            logger.warning(f"Retrying WhatsApp message {message.id} to {message.recipient} in {delay:.1f}s: {error}")
+        else:
+            self.store.mark_dead(message, error)
+            logger.error(f"WhatsApp message {message.id} to {message.recipient} moved to dead letters: {error}")
+
+_outbound_queue: Optional[OutboundQueue] = None
+
+def get_outbound_queue() -> OutboundQueue:
+    global _outbound_queue
+    if _outbound_queue is None:
+        _outbound_queue = OutboundQueue()
+    return _outbound_queue
+
+async def start_outbound_queue():
+    get_outbound_queue().start()
+
+async def stop_outbound_queue():
+    if _outbound_queue is not None:
+        await _outbound_queue.stop()
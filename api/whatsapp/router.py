@@ -1,7 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Dict, Any
 import json
-import httpx
 import logging
 from datetime import datetime
 import uuid
@@ -10,6 +9,9 @@ import uuid
 try:
     from ..env_config import config
     from .schemas import WhatsAppMessage, WhatsAppResponse
+    from .outbound import get_outbound_queue
+    from .dedup import dedup_key, get_seen_messages
+    from .inbound import InboundQueueFull, enqueue_inbound, get_inbound_consumer, get_inbound_store
     # For ClientRequest
     from ..respond_to_client import ClientRequest
 except ImportError:
@@ -19,6 +21,9 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from env_config import config
     from whatsapp.schemas import WhatsAppMessage, WhatsAppResponse
+    from whatsapp.outbound import get_outbound_queue
+    from whatsapp.dedup import dedup_key, get_seen_messages
+    from whatsapp.inbound import InboundQueueFull, enqueue_inbound, get_inbound_consumer, get_inbound_store
     from respond_to_client import ClientRequest
 
 # Set up logger
@@ -26,106 +31,51 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/whatsapp", tags=["WhatsApp"])
 
-# WhatsApp API client
-class WhatsAppClient:
-    def __init__(self):
-        self.api_key = getattr(config, "WHATSAPP_API_KEY", "test_key")
-        self.phone_number_id = getattr(config, "WHATSAPP_PHONE_NUMBER_ID", "test_id")
-        self.base_url = f"https://graph.facebook.com/v17.0/{self.phone_number_id}"
-        
-    async def send_message(self, to: str, message: str) -> bool:
-        """Send a text message via WhatsApp API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": to,
-            "type": "text",
-            "text": {"body": message}
-        }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/messages",
-                    headers=headers,
-                    json=payload
-                )
-                if response.status_code == 200:
-                    logger.info(f"Message sent to {to}")
-                    return True
-                else:
-                    logger.error(f"Failed to send message: {response.text}")
-                    return False
-        except Exception as e:
-            logger.error(f"Error sending WhatsApp message: {str(e)}")
-            return False
-
-# Get WhatsApp client
-def get_whatsapp_client():
-    return WhatsAppClient()
-
-# Process message with AI and send response
-async def process_message(message: WhatsAppMessage, background_tasks: BackgroundTasks):
-    """Process incoming WhatsApp message with AI and send response"""
-    try:
-        # Import here to avoid circular imports
-        from ..respond_to_client import respond_to_client
+FALLBACK_REPLY = "Thank you for your message! Our team will get back to you shortly."
+
+# Answer a message with AI and queue the replies
+async def reply_to_message(message: WhatsAppMessage):
+    """Answer an incoming WhatsApp message with AI and queue the replies; raises if that fails"""
+    # Import here to avoid circular imports
+    from ..respond_to_client import respond_to_client
+    
+    # Create AI request
+    ai_request = ClientRequest(
+        message=message.message,
+        language="en"  # Default to English, could detect language
+    )
+    
+    # Get AI response
+    ai_response = await respond_to_client(ai_request)
+    
+    # Format response for WhatsApp
+    whatsapp_message = format_ai_response_for_whatsapp(ai_response)
+    
+    # Queue the response; the outbound queue keeps per-recipient order, rate limits and retries
+    outbound = get_outbound_queue()
+    outbound.enqueue(message.from_number, whatsapp_message)
+    
+    # If listings are available, send them after the reply
+    if ai_response.listings:
+        for listing in ai_response.listings[:3]:  # Limit to 3 listings
+            outbound.enqueue(message.from_number, format_listing_for_whatsapp(listing))
+    
+    # If lead should be escalated, notify agent
+    if ai_response.escalate:
+        # Create a lead in the system
+        lead_id = await create_lead_from_whatsapp(message, ai_response)
         
-        # Create AI request
-        ai_request = ClientRequest(
+        # Notify agent about hot lead
+        await notify_agent_about_lead(
+            lead_id=lead_id,
+            phone=message.from_number,
             message=message.message,
-            language="en"  # Default to English, could detect language
+            score=ai_response.lead.score
         )
-        
-        try:
-            # Get AI response
-            ai_response = respond_to_client(ai_request)
-            
-            # Format response for WhatsApp
-            whatsapp_message = format_ai_response_for_whatsapp(ai_response)
-            
-            # Send response
-            client = WhatsAppClient()
-            await client.send_message(message.from_number, whatsapp_message)
-            
-            # If listings are available, send them
-            if ai_response.listings:
-                # Wait a moment before sending listings
-                for idx, listing in enumerate(ai_response.listings[:3]):  # Limit to 3 listings
-                    listing_message = format_listing_for_whatsapp(listing)
-                    # Add slight delay between messages
-                    await client.send_message(message.from_number, listing_message)
-            
-            # If lead should be escalated, notify agent
-            if ai_response.escalate:
-                # Create a lead in the system
-                lead_id = await create_lead_from_whatsapp(message, ai_response)
-                
-                # Notify agent about hot lead (in background)
-                background_tasks.add_task(
-                    notify_agent_about_lead,
-                    lead_id=lead_id,
-                    phone=message.from_number,
-                    message=message.message,
-                    score=ai_response.lead.score
-                )
-                
-            return True
-        except Exception as e:
-            logger.error(f"Error processing message with AI: {str(e)}")
-            # Send fallback message
-            client = WhatsAppClient()
-            await client.send_message(
-                message.from_number,
-                "Thank you for your message! Our team will get back to you shortly."
-            )
-            return False
-    except Exception as e:
-        logger.error(f"Critical error in process_message: {str(e)}")
-        return False
+
+def send_fallback_reply(to: str):
+    """Tell the client a person will follow up (when the AI reply could not be produced)"""
+    get_outbound_queue().enqueue(to, FALLBACK_REPLY)
 
 # Helper functions
 def format_ai_response_for_whatsapp(ai_response: Any) -> str:
@@ -169,17 +119,20 @@ async def notify_agent_about_lead(lead_id: str, phone: str, message: str, score:
 
 # Webhook endpoint for WhatsApp
 @router.post("/inbound")
-async def whatsapp_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    whatsapp: WhatsAppClient = Depends(get_whatsapp_client)
-) -> Dict[str, Any]:
+async def whatsapp_webhook(request: Request) -> Dict[str, Any]:
     """Handle incoming WhatsApp messages"""
     try:
         # Parse webhook payload
         payload = await request.json()
         logger.info(f"Received WhatsApp webhook: {json.dumps(payload)}")
         
+        # WhatsApp redelivers on timeouts; acknowledge replays without processing them again
+        key = dedup_key(payload)
+        seen = get_seen_messages()
+        if key is not None and seen.check_and_add(key):
+            logger.info(f"Ignoring redelivered WhatsApp webhook {key}")
+            return {"status": "success", "message": "Duplicate ignored"}
+        
         # Extract message data
         # Note: This is a simplified version. Real WhatsApp webhook has a more complex structure
         message_data = {
@@ -190,15 +143,23 @@ async def whatsapp_webhook(
             "name": payload.get("name", "")
         }
         
-        # Create WhatsApp message
-        whatsapp_message = WhatsAppMessage(**message_data)
-        
-        # Process message in background
-        background_tasks.add_task(process_message, whatsapp_message, background_tasks)
+        # Validate, then persist for the inbound consumers (api/whatsapp/inbound.py)
+        try:
+            WhatsAppMessage(**message_data)
+            await enqueue_inbound(message_data)
+        except Exception:
+            # Not accepted, so the redelivery must not be treated as a replay
+            if key is not None:
+                seen.forget(key)
+            raise
         
         # Return success immediately (WhatsApp expects quick response)
         return {"status": "success", "message": "Message received"}
     
+    except InboundQueueFull as e:
+        # WhatsApp redelivers webhooks that aren't acknowledged, so shed load instead of queueing without bound
+        logger.warning(f"Rejecting WhatsApp webhook: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error handling WhatsApp webhook: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
@@ -216,6 +177,29 @@ async def verify_webhook(request: Request) -> Response:
     else:
         raise HTTPException(status_code=403, detail="Invalid verification token")
 
+# Queue monitoring
+@router.get("/inbound/stats")
+def inbound_stats() -> Dict[str, Any]:
+    """Inbound message counts by status (and this process's consumers); sync, so it runs in the threadpool"""
+    return get_inbound_consumer().stats() if config.WHATSAPP_INBOUND_CONSUMERS_IN_APP else get_inbound_store().counts()
+
+@router.get("/outbound/stats")
+async def outbound_stats() -> Dict[str, Any]:
+    """Outbound message counts by status"""
+    return get_outbound_queue().stats()
+
+@router.get("/outbound/dead_letters")
+async def outbound_dead_letters(limit: int = 100) -> Dict[str, Any]:
+    """Messages that could not be delivered, newest first"""
+    return {"dead_letters": get_outbound_queue().store.dead_letters(limit)}
+
+@router.post("/outbound/dead_letters/{message_id}/requeue")
+async def requeue_dead_letter(message_id: int) -> Dict[str, Any]:
+    """Retry a dead-lettered message"""
+    if not get_outbound_queue().requeue(message_id):
+        raise HTTPException(status_code=404, detail=f"No dead letter with id {message_id}")
+    return {"status": "requeued", "id": message_id}
+
 # Health check endpoint
 @router.get("/health")
 async def health_check() -> Dict[str, str]:
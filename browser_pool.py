@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+# For dynamic scraping
+try:
+    from playwright.async_api import async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+# Resource types that never matter for listing extraction
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+
+class BrowserPool:
+    """
+    Shared headless Chromium for rendering JS-heavy listing pages.
+
+    One browser is launched for the whole crawl and `size` isolated contexts
+    are opened on it, each with a single reusable page; `size` is therefore
+    also the cap on concurrent renders. Image, font and media requests are
+    aborted. A page is closed and replaced after `max_uses` renders to bound
+    memory growth from long-lived pages. A slot always goes back to the pool;
+    if its replacement page can't be opened, the next render opens it.
+    """
+
+    def __init__(self, size: int = 4, max_uses: int = 50, timeout_ms: int = 30000):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.timeout_ms = timeout_ms
+        self._playwright = None
+        self._browser = None
+        self._contexts: List = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "BrowserPool":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Launch the browser and its contexts; called lazily on the first render"""
+        async with self._start_lock:
+            if self._browser is not None:
+                return
+            if not PLAYWRIGHT_AVAILABLE:
+                raise ImportError("Playwright is not installed. Please install it for dynamic scraping.")
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                context = await self._browser.new_context()
+                await context.route("**/*", self._filter_request)
+                self._contexts.append(context)
+                self._idle.put_nowait((context, await context.new_page(), 0))
+            logging.info(f"Started browser pool with {self.size} contexts")
+
+    @staticmethod
+    async def _filter_request(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def render(self, url: str) -> str:
+        """Load a URL in a pooled page and return the rendered HTML"""
+        await self.start()
+        context, page, uses = await self._idle.get()
+        try:
+            if page is None:
+                page = await context.new_page()
+            await page.goto(url, timeout=self.timeout_ms)
+            return await page.content()
+        finally:
+            uses += 1
+            try:
+                if page is None or uses >= self.max_uses or page.is_closed():
+                    old_page, page, uses = page, None, 0
+                    if old_page is not None and not old_page.is_closed():
+                        await old_page.close()
+                    page = await context.new_page()
+            except Exception as e:
+                logging.warning(f"Could not replace browser page, opening it on next use: {e}")
+            finally:
+                self._idle.put_nowait((context, page, uses))
+
+    async def close(self):
+        if self._browser is None:
+            return
+        for context in self._contexts:
+            await context.close()
+        await self._browser.close()
+        await self._playwright.stop()
+        self._contexts, self._browser, self._playwright = [], None, None
@@ -0,0 +1,87 @@
+import hashlib
+import sqlite3
+import time
+from typing import Dict, NamedTuple, Optional
+
+class CacheEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+    next_url: Optional[str]
+    fetched_at: float
+
+def body_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class FetchCache:
+    """
+    On-disk per-URL fetch cache for incremental re-crawls.
+
+    For every successfully scraped page it keeps the ETag / Last-Modified
+    validators, a hash of the body and the page's "next page" link. Re-crawls
+    send If-None-Match / If-Modified-Since and skip parsing when the server
+    answers 304 or the body hash is unchanged; the stored next link lets
+    pagination continue past unchanged result pages. Backed by SQLite, so it
+    is meant to be used from one thread (the crawler's event loop).
+    """
+
+    def __init__(self, path: str = "fetch_cache.sqlite3"):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fetch_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                next_url TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def __enter__(self) -> "FetchCache":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT etag, last_modified, body_hash, next_url, fetched_at FROM fetch_cache WHERE url = ?",
+            (url,)
+        ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified"""
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    @staticmethod
+    def unchanged(entry: Optional[CacheEntry], status_code: int, content_hash: Optional[str]) -> bool:
+        """True if a conditional fetch shows the cached page hasn't changed"""
+        return entry is not None and (status_code == 304 or entry.body_hash == content_hash)
+
+    def store(self, url: str, headers, content_hash: str, next_url: Optional[str] = None):
+        """Record a scraped page's validators (from its response headers), body hash and next link"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fetch_cache (url, etag, last_modified, body_hash, next_url, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, headers.get('ETag'), headers.get('Last-Modified'), content_hash, next_url, time.time())
+        )
+        self._conn.commit()
+
+    def touch(self, url: str):
+        self._conn.execute("UPDATE fetch_cache SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
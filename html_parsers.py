@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+# Fastest BeautifulSoup tree builder available
+try:
+    import lxml  # noqa: F401
+    BS4_FEATURES = 'lxml'
+except ImportError:
+    BS4_FEATURES = 'html.parser'
+
+# Optional selectolax parser for profiled sites (Lexbor backend, Modest on selectolax < 1.0)
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SELECTOLAX_AVAILABLE = False
+
+SITE_PROFILES_PATH = os.getenv('SITE_PROFILES_PATH', 'site_profiles.json')
+
+_WHITESPACE = re.compile(r'\s+')
+_NON_NUMERIC = re.compile(r'[^\d.]')
+
+def parse_html(html: str) -> BeautifulSoup:
+    """Parse HTML with the fastest installed BeautifulSoup backend (lxml, else html.parser)"""
+    return BeautifulSoup(html, BS4_FEATURES)
+
+def _clean(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    text = _WHITESPACE.sub(' ', text).strip()
+    return text or None
+
+def _price(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    try:
+        return float(_NON_NUMERIC.sub('', text))
+    except ValueError:
+        return None
+
+@dataclass
+class SiteProfile:
+    """
+    CSS selectors for one listings portal. Selectors are compiled once with
+    soupsieve for the BeautifulSoup path; when selectolax is installed it is
+    used instead and the page is never built as a BeautifulSoup tree.
+    `card` selects result cards on index pages (every field selector is then
+    relative to a card); `dynamic` skips the static/dynamic heuristics and
+    always renders the page with Playwright.
+    """
+    host: str
+    title: str
+    price: str
+    location: Optional[str] = None
+    description: Optional[str] = None
+    media: str = 'img[src], video[src]'
+    link: str = 'a[href]'
+    card: Optional[str] = None
+    next_page: Optional[str] = None
+    dynamic: bool = False
+    _compiled: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+
+    SELECTOR_FIELDS = ('title', 'price', 'location', 'description', 'media', 'link', 'card', 'next_page')
+
+    def __post_init__(self):
+        self._compiled = {
+            name: sv.compile(getattr(self, name))
+            for name in self.SELECTOR_FIELDS
+            if getattr(self, name)
+        }
+
+    def extract(self, html: str, url: str, paginate: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Extract listings (and optionally the next page URL) from a page of this site"""
+        if SELECTOLAX_AVAILABLE:
+            return self._extract_selectolax(html, url, paginate)
+        return self._extract_soup(parse_html(html), url, paginate)
+
+    def _extract_soup(self, soup: BeautifulSoup, url: str, paginate: bool) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        def text(root, name):
+            selector = self._compiled.get(name)
+            node = selector.select_one(root) if selector else None
+            return node.get_text() if node else None
+
+        roots = self._compiled['card'].select(soup) if self.card else [soup]
+        listings = []
+        for root in roots:
+            media = [node.get('src') for node in self._compiled['media'].select(root)]
+            link = self._compiled['link'].select_one(root) if self.card else None
+            listings.append(self._listing(
+                text(root, 'title'), text(root, 'price'), text(root, 'location'), text(root, 'description'),
+                media, link.get('href') if link else None, url
+            ))
+        next_url = None
+        if paginate and self.next_page:
+            node = self._compiled['next_page'].select_one(soup)
+            next_url = urljoin(url, node.get('href')) if node and node.get('href') else None
+        return listings, next_url
+
+    def _extract_selectolax(self, html: str, url: str, paginate: bool) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        tree = HTMLParser(html)
+
+        def text(root, selector):
+            node = root.css_first(selector) if selector else None
+            return node.text() if node else None
+
+        roots = tree.css(self.card) if self.card else [tree.root]
+        listings = []
+        for root in roots:
+            media = [node.attributes.get('src') for node in root.css(self.media)]
+            link = root.css_first(self.link) if self.card else None
+            listings.append(self._listing(
+                text(root, self.title), text(root, self.price), text(root, self.location), text(root, self.description),
+                media, link.attributes.get('href') if link else None, url
+            ))
+        next_url = None
+        if paginate and self.next_page:
+            node = tree.css_first(self.next_page)
+            href = node.attributes.get('href') if node else None
+            next_url = urljoin(url, href) if href else None
+        return listings, next_url
+
+    @staticmethod
+    def _listing(title, price, location, description, media, href, url) -> Dict[str, Any]:
+        listing = {
+            "title": _clean(title),
+            "price": _price(price),
+            "location": _clean(location),
+            "description": _clean(description),
+            "media": [src for src in media if src and src.startswith('http')]
+        }
+        if href:
+            listing['url'] = urljoin(url, href)
+        return listing
+
+_profiles: Optional[Dict[str, SiteProfile]] = None
+
+def load_site_profiles(path: str = SITE_PROFILES_PATH) -> Dict[str, SiteProfile]:
+    """Load per-site selector profiles from a JSON list of SiteProfile fields"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    profiles = {}
+    for entry in entries:
+        profile = SiteProfile(**entry)
+        profiles[profile.host.lower().removeprefix('www.')] = profile
+    logging.info(f"Loaded {len(profiles)} site profiles from {path}")
+    return profiles
+
+def get_profile(url: str) -> Optional[SiteProfile]:
+    """Return the selector profile for a URL's host (or a parent domain), if any"""
+    global _profiles
+    if _profiles is None:
+        _profiles = load_site_profiles()
+    host = urlparse(url).netloc.lower().split(':')[0].removeprefix('www.')
+    while host:
+        if host in _profiles:
+            return _profiles[host]
+        host = host.partition('.')[2]
+    return None
+
+def benchmark(html: str, repeat: int = 20, profile: Optional[SiteProfile] = None) -> Dict[str, float]:
+    """Mean seconds per page for each available parse (+ extract) pipeline"""
+    from ingest_listings import extract_listing_from_soup
+
+    pipelines = {
+        'bs4[html.parser] parse': lambda: BeautifulSoup(html, 'html.parser'),
+        'bs4[html.parser] parse+extract': lambda: extract_listing_from_soup(BeautifulSoup(html, 'html.parser')),
+    }
+    if BS4_FEATURES == 'lxml':
+        pipelines['bs4[lxml] parse'] = lambda: BeautifulSoup(html, 'lxml')
+        pipelines['bs4[lxml] parse+extract'] = lambda: extract_listing_from_soup(BeautifulSoup(html, 'lxml'))
+    if SELECTOLAX_AVAILABLE:
+        pipelines['selectolax parse'] = lambda: HTMLParser(html)
+    if profile is not None:
+        pipelines['profile bs4 parse+extract'] = lambda: profile._extract_soup(parse_html(html), '', False)
+        if SELECTOLAX_AVAILABLE:
+            pipelines['profile selectolax parse+extract'] = lambda: profile._extract_selectolax(html, '', False)
+
+    results = {}
+    for name, run in pipelines.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        results[name] = (time.perf_counter() - start) / repeat
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing backends on a saved listing page.")
+    parser.add_argument('html_file', type=str, help='Saved HTML page')
+    parser.add_argument('--repeat', type=int, default=20, help='Iterations per pipeline')
+    parser.add_argument('--url', type=str, default=None, help='Page URL, to benchmark its site profile too')
+    args = parser.parse_args()
+    with open(args.html_file, 'r', encoding='utf-8') as f:
+        html = f.read()
+    results = benchmark(html, args.repeat, get_profile(args.url) if args.url else None)
+    baseline = results['bs4[html.parser] parse+extract']
+    for name, seconds in results.items():
+        print(f"{name:<36} {seconds * 1000:9.2f} ms  ({baseline / seconds:5.1f}x vs html.parser parse+extract)")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 import argparse
+import hashlib
 import json
 import logging
 import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple, Union
 
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
 
 # For static scraping
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
+
+from html_parsers import get_profile, parse_html
 
 # For dynamic scraping
 try:
@@ -25,18 +28,26 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
+# Generic extraction patterns, compiled once; for production, add a site profile (see html_parsers.py)
+TITLE_CLASS_PATTERN = re.compile(r'(title|headline)', re.I)
+PRICE_PATTERN = re.compile(r'\$|€|AED|USD|\d{3,}')
+LOCATION_CLASS_PATTERN = re.compile(r'(location|address|area)', re.I)
+DESCRIPTION_CLASS_PATTERN = re.compile(r'(description|desc|details)', re.I)
+NEXT_LABEL_PATTERN = re.compile(r'^\s*(next|next page|›|»|>|→)\s*$', re.I)
+
+def is_dynamic_html(soup: BeautifulSoup) -> bool:
+    """Heuristically determine if an already-parsed page is dynamic (JS-heavy) or static."""
+    # Heuristic: if <script> tags are more than X% of HTML, likely dynamic
+    scripts = soup.find_all('script')
+    return len(scripts) > 10 or any('window.__' in s.text for s in scripts if s.string)
+
 def is_dynamic_page(url: str) -> bool:
     """Heuristically determine if a page is dynamic (JS-heavy) or static."""
     try:
         resp = requests.get(url, timeout=10)
         if 'text/html' not in resp.headers.get('Content-Type', ''):
             return False
-        # Heuristic: if <script> tags are more than X% of HTML, likely dynamic
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        scripts = soup.find_all('script')
-        if len(scripts) > 10 or any('window.__' in s.text for s in scripts if s.string):
-            return True
-        return False
+        return is_dynamic_html(parse_html(resp.text))
     except Exception as e:
         logging.warning(f"Failed to check if page is dynamic: {e}")
         return True  # Default to dynamic if unsure
@@ -44,12 +55,13 @@ def is_dynamic_page(url: str) -> bool:
 def clean_text(text: str) -> str:
     return re.sub(r'\s+', ' ', text).strip()
 
-def extract_static(url: str) -> List[Dict[str, Any]]:
-    resp = requests.get(url, timeout=15)
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    return [extract_listing_from_soup(soup)]
+def classify_page(html: str, content_type: str) -> Tuple[BeautifulSoup, bool]:
+    """Parse a fetched page once and report whether it needs JS rendering"""
+    soup = parse_html(html)
+    return soup, 'text/html' in content_type and is_dynamic_html(soup)
 
-def extract_dynamic(url: str) -> List[Dict[str, Any]]:
+def render_dynamic(url: str) -> str:
+    """Render a JS-heavy page with a throwaway Playwright browser and return its HTML"""
     if not PLAYWRIGHT_AVAILABLE:
         raise ImportError("Playwright is not installed. Please install it for dynamic scraping.")
     with sync_playwright() as p:
@@ -57,19 +69,91 @@ def extract_dynamic(url: str) -> List[Dict[str, Any]]:
         page = browser.new_page()
         page.goto(url, timeout=30000)
         html = page.content()
-        soup = BeautifulSoup(html, 'html.parser')
-        listings = [extract_listing_from_soup(soup)]
         browser.close()
-        return listings
+        return html
+
+def extract_static(url: str) -> List[Dict[str, Any]]:
+    resp = requests.get(url, timeout=15)
+    soup = parse_html(resp.text)
+    return [extract_listing_from_soup(soup)]
+
+def extract_dynamic(url: str) -> List[Dict[str, Any]]:
+    return [extract_listing_from_soup(parse_html(render_dynamic(url)))]
+
+def extract_page(soup: BeautifulSoup, url: str, cards: bool = False, paginate: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Extract listings from a parsed page. In card mode every repeated listing
+    card is extracted from this one parse (falling back to a single listing
+    when no cards are found). Returns the listings and, if `paginate`, the
+    URL of the next results page.
+    """
+    listings = None
+    if cards:
+        found = find_listing_cards(soup)
+        if found:
+            listings = [extract_listing_from_card(card, url) for card in found]
+            logging.info(f"Found {len(listings)} listing cards on {url}")
+    if listings is None:
+        listings = [extract_listing_from_soup(soup)]
+    return listings, find_next_page(soup, url) if paginate else None
+
+def find_listing_cards(soup: BeautifulSoup, min_cards: int = 3) -> List[Tag]:
+    """
+    Detect repeated listing containers on a search/index page: the largest
+    group of sibling elements sharing a tag and class list, at least
+    `min_cards` strong, where most members contain a price and a link or
+    heading.
+    """
+    groups: Dict[Tuple[int, str, Tuple[str, ...]], List[Tag]] = {}
+    for element in soup.find_all(class_=True):
+        if element.parent is None:
+            continue
+        signature = (id(element.parent), element.name, tuple(sorted(element.get('class', []))))
+        groups.setdefault(signature, []).append(element)
+
+    best: List[Tag] = []
+    for members in groups.values():
+        if len(members) < max(min_cards, len(best) + 1):
+            continue
+        qualifying = sum(
+            1 for m in members
+            if m.find(string=PRICE_PATTERN) and m.find(['a', 'h2', 'h3', 'h4'])
+        )
+        if qualifying >= 0.8 * len(members):
+            best = members
+    return best
+
+def extract_listing_from_card(card: Tag, page_url: str) -> Dict[str, Any]:
+    """Extract one listing from a search-result card, including its detail page URL"""
+    listing = extract_listing_from_soup(card)
+    if not listing['title']:
+        heading = card.find(['h3', 'h4', 'a'])
+        listing['title'] = clean_text(heading.get_text()) if heading else None
+    link = card.find('a', href=True)
+    if link:
+        listing['url'] = urljoin(page_url, link['href'])
+    return listing
+
+def find_next_page(soup: BeautifulSoup, url: str) -> Optional[str]:
+    """Find the next results page via rel="next" or a "Next"-style pagination link"""
+    link = soup.find(['a', 'link'], rel='next', href=True)
+    if not link:
+        link = soup.find('a', href=True, attrs={'aria-label': re.compile(r'next', re.I)})
+    if not link:
+        link = soup.find('a', href=True, string=NEXT_LABEL_PATTERN)
+    if not link:
+        return None
+    next_url = urljoin(url, link['href'])
+    return next_url if next_url != url else None
 
-def extract_listing_from_soup(soup: BeautifulSoup) -> Dict[str, Any]:
+def extract_listing_from_soup(soup: Union[BeautifulSoup, Tag]) -> Dict[str, Any]:
     # These selectors are generic; for production, customize per site
-    title = soup.find(['h1', 'h2'], class_=re.compile(r'(title|headline)', re.I))
+    title = soup.find(['h1', 'h2'], class_=TITLE_CLASS_PATTERN)
     if not title:
         title = soup.find(['h1', 'h2'])
     title = clean_text(title.get_text()) if title else None
 
-    price = soup.find(string=re.compile(r'\$|€|AED|USD|\d{3,}'))
+    price = soup.find(string=PRICE_PATTERN)
     if price:
         price = re.sub(r'[^\d.]', '', price)
         try:
@@ -79,12 +163,12 @@ def extract_listing_from_soup(soup: BeautifulSoup) -> Dict[str, Any]:
     else:
         price = None
 
-    location = soup.find(class_=re.compile(r'(location|address|area)', re.I))
+    location = soup.find(class_=LOCATION_CLASS_PATTERN)
     if not location:
         location = soup.find('address')
     location = clean_text(location.get_text()) if location else None
 
-    desc = soup.find('div', class_=re.compile(r'(description|desc|details)', re.I))
+    desc = soup.find('div', class_=DESCRIPTION_CLASS_PATTERN)
     if not desc:
         desc = soup.find('p')
     description = clean_text(desc.get_text()) if desc else None
@@ -110,41 +194,236 @@ def extract_listing_from_soup(soup: BeautifulSoup) -> Dict[str, Any]:
 def validate_listing(listing: Dict[str, Any]) -> bool:
     return bool(listing.get('title')) and isinstance(listing.get('price'), float)
 
-def ingest_listings(url: str, output_path: str = "listings.json"):
-    logging.info(f"Starting ingestion for {url}")
-    try:
-        dynamic = is_dynamic_page(url)
-        if dynamic:
-            logging.info("Detected dynamic page. Using Playwright.")
-            listings = extract_dynamic(url)
-        else:
-            logging.info("Detected static page. Using requests/BeautifulSoup.")
-            listings = extract_static(url)
-    except Exception as e:
-        logging.error(f"Failed to scrape {url}: {e}")
+# Bookkeeping fields added to NDJSON records; excluded from the content hash
+RECORD_FIELDS = ('id', 'content_hash')
+
+def listing_key(listing: Dict[str, Any]) -> str:
+    """Stable identity of a listing across scrapes: its detail (or source) page and title"""
+    identity = f"{listing.get('url') or listing.get('source_url') or ''}\n{listing.get('title') or ''}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+def content_hash(listing: Dict[str, Any]) -> str:
+    """Hash of the listing's scraped content, used to dedup and detect changes"""
+    content = {k: v for k, v in listing.items() if k not in RECORD_FIELDS}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def to_record(listing: Dict[str, Any]) -> Dict[str, Any]:
+    return {**listing, 'id': listing_key(listing), 'content_hash': content_hash(listing)}
+
+def iter_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from an NDJSON file, skipping blank or truncated lines"""
+    if not os.path.exists(path):
         return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping malformed line {line_no} in {path}")
+
+def append_ndjson(listings: Iterable[Dict[str, Any]], path: str, seen: Optional[Set[str]] = None) -> int:
+    """
+    Append listings to an NDJSON file, one record per line, skipping any whose
+    content hash is in `seen` (the hashes written so far by the same crawl,
+    updated in place). The journal itself is never re-read: duplicates across
+    runs are dropped by compact_ndjson. Returns the number of records written.
+    """
+    if seen is None:
+        seen = set()
+    written = 0
+    with open(path, 'a', encoding='utf-8') as f:
+        for listing in listings:
+            record = to_record(listing)
+            if record['content_hash'] in seen:
+                continue
+            seen.add(record['content_hash'])
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += 1
+    return written
+
+def write_catalog(listings: List[Dict[str, Any]], path: str):
+    """
+    Write the JSON catalog as {"listings": [...]} via a temp file and swap it
+    in, so the API's catalog watcher never reads a partial file
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'listings': listings}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def compact_ndjson(ndjson_path: str, catalog_path: str) -> int:
+    """
+    Merge NDJSON scrape results into the JSON catalog, keyed by listing id.
+    New listings are appended, listings whose content hash changed are
+    replaced in place and unchanged ones are left alone. The catalog is only
+    rewritten when something changed.
+
+    The journal is first renamed to `<ndjson_path>.compacting`, so appends
+    made while merging start a fresh journal instead of being lost, and that
+    file is deleted once the catalog is written. A `.compacting` file left by
+    an interrupted run is merged before the live journal. Returns the number
+    of inserted or updated listings.
+    """
+    compacting_path = f"{ndjson_path}.compacting"
+    recovering = os.path.exists(compacting_path)
+    if not recovering:
+        if not os.path.exists(ndjson_path):
+            return 0
+        os.replace(ndjson_path, compacting_path)
 
+    catalog: List[Dict[str, Any]] = []
+    if os.path.exists(catalog_path):
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content:
+            catalog = json.loads(content)
+            if isinstance(catalog, dict):
+                catalog = catalog.get('listings', [])
+
+    positions = {}
+    for position, listing in enumerate(catalog):
+        positions[listing.get('id') or listing_key(listing)] = position
+
+    changed = 0
+    for record in iter_ndjson(compacting_path):
+        key = record.get('id') or listing_key(record)
+        position = positions.get(key)
+        if position is None:
+            positions[key] = len(catalog)
+            catalog.append(record)
+        elif catalog[position].get('content_hash') != record.get('content_hash'):
+            catalog[position] = record
+        else:
+            continue
+        changed += 1
+
+    if changed:
+        write_catalog(catalog, catalog_path)
+    os.remove(compacting_path)
+    logging.info(f"Compacted {changed} new or changed listings from {compacting_path} into {catalog_path}")
+    if recovering:
+        changed += compact_ndjson(ndjson_path, catalog_path)
+    return changed
+
+def validated_listings(listings: List[Dict[str, Any]], url: str) -> List[Dict[str, Any]]:
+    """Keep valid listings, tagged with the URL they were scraped from"""
     valid_listings = []
     for listing in listings:
         if validate_listing(listing):
+            listing['source_url'] = url
             valid_listings.append(listing)
             logging.info(f"Extracted: {listing['title']} at {listing['price']}")
         else:
             logging.warning(f"Skipped invalid listing: {listing}")
+    return valid_listings
+
+def scrape_page(url: str, cards: bool = False, paginate: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Scrape one page with a single fetch. Sites with a selector profile are
+    extracted with their precompiled selectors; otherwise the response body
+    is parsed once for both the static/dynamic classification and generic
+    extraction. Dynamic pages are re-rendered with Playwright. Returns valid
+    listings and the next page URL.
+    """
+    profile = get_profile(url)
+    resp = None
+    if not (profile and profile.dynamic):
+        try:
+            resp = requests.get(url, timeout=15)
+        except Exception as e:
+            logging.warning(f"Failed to fetch {url}, falling back to Playwright: {e}")
+
+    if profile:
+        html = render_dynamic(url) if resp is None else resp.text
+        listings, next_url = profile.extract(html, url, paginate)
+        return validated_listings(listings, url), next_url
+
+    if resp is None:
+        soup, dynamic = None, True
+    else:
+        soup, dynamic = classify_page(resp.text, resp.headers.get('Content-Type', ''))
+    if dynamic:
+        logging.info(f"Detected dynamic page {url}. Using Playwright.")
+        soup = parse_html(render_dynamic(url))
+    else:
+        logging.info(f"Detected static page {url}. Using requests/BeautifulSoup.")
+    listings, next_url = extract_page(soup, url, cards, paginate)
+    return validated_listings(listings, url), next_url
+
+def scrape_listings(url: str, cards: bool = False, max_pages: int = 1) -> List[Dict[str, Any]]:
+    """Scrape a URL, following up to `max_pages` result pages, and return its valid listings"""
+    valid_listings: List[Dict[str, Any]] = []
+    visited = set()
+    page_url: Optional[str] = url
+    while page_url and page_url not in visited and len(visited) < max_pages:
+        visited.add(page_url)
+        listings, page_url = scrape_page(page_url, cards, paginate=len(visited) < max_pages)
+        valid_listings.extend(listings)
+    return valid_listings
+
+def ingest_listings(
+    url: str,
+    output_path: str = "listings.json",
+    output_format: str = "json",
+    cards: bool = False,
+    max_pages: int = 1
+):
+    logging.info(f"Starting ingestion for {url}")
+    try:
+        valid_listings = scrape_listings(url, cards, max_pages)
+    except Exception as e:
+        logging.error(f"Failed to scrape {url}: {e}")
+        return
 
     # TODO: Structure listings for Supabase insert schema here
     # TODO: Integrate with Supabase or next-agent ingest here
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(valid_listings, f, indent=2, ensure_ascii=False)
-    logging.info(f"Saved {len(valid_listings)} listings to {output_path}")
+    if output_format == 'ndjson':
+        written = append_ndjson(valid_listings, output_path)
+        logging.info(f"Appended {written} new listings to {output_path} ({len(valid_listings) - written} duplicates skipped)")
+    else:
+        write_catalog(valid_listings, output_path)
+        logging.info(f"Saved {len(valid_listings)} listings to {output_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Ingest real estate listings from a URL.")
-    parser.add_argument('url', type=str, help='URL to scrape')
-    parser.add_argument('--output', type=str, default='listings.json', help='Output JSON file')
+    parser.add_argument('url', type=str, nargs='?', help='URL to scrape')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output file (default: listings.json, or listings.ndjson with --format ndjson)')
+    parser.add_argument('--format', dest='output_format', choices=['json', 'ndjson'], default='json',
+                        help='json rewrites the output file; ndjson appends deduplicated records')
+    parser.add_argument('--compact', type=str, metavar='CATALOG', default=None,
+                        help='Merge the NDJSON output into this JSON catalog after ingesting')
+    parser.add_argument('--cards', action='store_true',
+                        help='Search/index pages: extract every repeated listing card instead of one listing per page')
+    parser.add_argument('--max-pages', type=int, default=1,
+                        help='Follow "next page" links up to this many result pages per start URL')
+    parser.add_argument('--urls', type=str, default=None,
+                        help='Batch mode: file with one URL per line, or a sitemap XML path/URL')
+    parser.add_argument('--concurrency', type=int, default=16, help='Batch mode: total concurrent fetches')
+    parser.add_argument('--per-host', type=int, default=4, help='Batch mode: concurrent fetches per host')
+    parser.add_argument('--browsers', type=int, default=4, help='Batch mode: concurrent Playwright pages for dynamic pages')
+    parser.add_argument('--cache', type=str, default=None, metavar='PATH',
+                        help='Batch mode: SQLite fetch cache for conditional re-crawls (requires --format ndjson)')
     args = parser.parse_args()
-    ingest_listings(args.url, args.output)
+    output = args.output or ('listings.ndjson' if args.output_format == 'ndjson' else 'listings.json')
+    if not args.url and not args.urls and not args.compact:
+        parser.error('a URL or --urls is required unless only compacting')
+    if args.cache and (not args.urls or args.output_format != 'ndjson'):
+        # Unchanged pages yield no records, so the cache only makes sense when merging into a catalog
+        parser.error('--cache requires --urls and --format ndjson')
+    if args.urls:
+        from listing_crawler import ingest_batch
+        ingest_batch(args.urls, output, args.output_format, args.concurrency, args.per_host, args.browsers,
+                     args.cards, args.max_pages, args.cache)
+    elif args.url:
+        ingest_listings(args.url, output, args.output_format, args.cards, args.max_pages)
+    if args.compact:
+        compact_ndjson(output, args.compact)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from browser_pool import BrowserPool
+from fetch_cache import FetchCache, body_hash
+from html_parsers import get_profile, parse_html
+from ingest_listings import (
+    append_ndjson,
+    classify_page,
+    extract_page,
+    validated_listings,
+    write_catalog,
+)
+
+USER_AGENT = "SerenityListingCrawler/1.0"
+MAX_SITEMAP_DEPTH = 3
+
+def _parse_sitemap(xml: str) -> Tuple[List[str], List[str]]:
+    """Return (page URLs, nested sitemap URLs) from a sitemap or sitemap index"""
+    root = ET.fromstring(xml)
+    locations = [
+        (element.text or '').strip()
+        for element in root.iter()
+        if element.tag == 'loc' or element.tag.endswith('}loc')
+    ]
+    locations = [location for location in locations if location]
+    if root.tag.endswith('sitemapindex'):
+        return [], locations
+    return locations, []
+
+def read_urls(source: str) -> List[str]:
+    """
+    Load crawl targets from a text file (one URL per line, '#' comments) or a
+    sitemap, given as a local .xml path or an http(s) URL. Sitemap indexes
+    are followed up to MAX_SITEMAP_DEPTH levels.
+    """
+    is_remote = source.startswith(('http://', 'https://'))
+    if not is_remote and not source.endswith('.xml'):
+        with open(source, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    urls: List[str] = []
+    pending = [(source, 0)]
+    with httpx.Client(timeout=15, follow_redirects=True, headers={'User-Agent': USER_AGENT}) as client:
+        while pending:
+            location, depth = pending.pop()
+            if location.startswith(('http://', 'https://')):
+                xml = client.get(location).text
+            else:
+                with open(location, 'r', encoding='utf-8') as f:
+                    xml = f.read()
+            pages, sitemaps = _parse_sitemap(xml)
+            urls.extend(pages)
+            if depth < MAX_SITEMAP_DEPTH:
+                pending.extend((sitemap, depth + 1) for sitemap in sitemaps)
+    return urls
+
+class ListingCrawler:
+    """
+    Bounded asyncio crawler for listing pages.
+
+    A fixed pool of workers pulls URLs from a queue and shares one pooled
+    httpx client. Each host additionally gets its own semaphore so a single
+    portal never sees more than `per_host` concurrent requests. Every page is
+    downloaded once: the same body is used to classify it as static/dynamic
+    and for static extraction, or goes straight to the site's selector
+    profile when one exists. Parsing runs in worker threads so it doesn't
+    stall other fetches; dynamic pages are rendered through a shared
+    BrowserPool. With a FetchCache, a page's validators are only stored once
+    the caller reports its listings persisted through `commit()`, so an
+    interrupted run re-fetches pages it never wrote out.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        per_host: int = 4,
+        timeout: float = 15.0,
+        browser_pool: Optional[BrowserPool] = None,
+        cards: bool = False,
+        max_pages: int = 1,
+        cache: Optional[FetchCache] = None
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.browser_pool = browser_pool or BrowserPool()
+        self.cards = cards
+        self.max_pages = max(1, max_pages)
+        self.cache = cache
+        self._host_limits: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._uncommitted: Dict[str, Tuple[Any, Optional[str], Optional[str]]] = {}
+
+    async def crawl(self, urls: List[str]) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yield (url, valid listings) for each scraped page, including followed result pages"""
+        queue: asyncio.Queue = asyncio.Queue()
+        seen: Set[str] = set()
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                queue.put_nowait((url, 1))
+        results: asyncio.Queue = asyncio.Queue()
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=limits,
+            follow_redirects=True,
+            headers={'User-Agent': USER_AGENT}
+        ) as client:
+            workers = [
+                asyncio.create_task(self._worker(client, queue, results, seen))
+                for _ in range(self.concurrency)
+            ]
+            done = asyncio.create_task(queue.join())
+            try:
+                while True:
+                    getter = asyncio.ensure_future(results.get())
+                    await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+                        while not results.empty():
+                            yield results.get_nowait()
+                        break
+            finally:
+                done.cancel()
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(done, *workers, return_exceptions=True)
+
+    async def _worker(self, client: httpx.AsyncClient, queue: asyncio.Queue, results: asyncio.Queue, seen: Set[str]):
+        while True:
+            url, page = await queue.get()
+            try:
+                listings, next_url = await self.scrape(client, url, paginate=page < self.max_pages)
+                if next_url and next_url not in seen:
+                    seen.add(next_url)
+                    queue.put_nowait((next_url, page + 1))
+            except Exception as e:
+                logging.error(f"Failed to scrape {url}: {e}")
+                listings = []
+            await results.put((url, listings))
+            queue.task_done()
+
+    def commit(self, urls: List[str]):
+        """Store cache entries for scraped pages whose listings have been persisted"""
+        if self.cache is None:
+            return
+        for url in urls:
+            entry = self._uncommitted.pop(url, None)
+            if entry is not None:
+                self.cache.store(url, *entry)
+
+    async def scrape(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        paginate: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        profile = get_profile(url)
+        if profile and profile.dynamic:
+            html = await self.browser_pool.render(url)
+            listings, next_url = await asyncio.to_thread(profile.extract, html, url, paginate)
+            return validated_listings(listings, url), next_url
+
+        entry = self.cache.get(url) if self.cache else None
+        headers = self.cache.conditional_headers(entry) if self.cache else None
+        async with self._host_limits[urlparse(url).netloc]:
+            resp = await client.get(url, headers=headers)
+        digest = body_hash(resp.content) if resp.status_code != 304 else None
+        if self.cache and FetchCache.unchanged(entry, resp.status_code, digest):
+            logging.info(f"Unchanged since last crawl, skipping: {url}")
+            self.cache.touch(url)
+            return [], entry.next_url if paginate else None
+        resp.raise_for_status()
+
+        # With a cache, always look up the next link so it can be replayed for unchanged pages
+        find_next = paginate or self.cache is not None
+        validators = resp.headers
+        if profile:
+            listings, next_url = await asyncio.to_thread(profile.extract, resp.text, url, find_next)
+        else:
+            soup, dynamic = await asyncio.to_thread(classify_page, resp.text, resp.headers.get('Content-Type', ''))
+            if dynamic:
+                logging.info(f"Detected dynamic page {url}. Rendering with the browser pool.")
+                html = await self.browser_pool.render(url)
+                # The static shell says nothing about rendered content: cache by rendered body only
+                digest, validators = body_hash(html.encode('utf-8')), {}
+                if self.cache and FetchCache.unchanged(entry, 200, digest):
+                    logging.info(f"Rendered page unchanged since last crawl, skipping: {url}")
+                    self.cache.touch(url)
+                    return [], entry.next_url if paginate else None
+                soup = await asyncio.to_thread(parse_html, html)
+            listings, next_url = await asyncio.to_thread(extract_page, soup, url, self.cards, find_next)
+        if self.cache:
+            self._uncommitted[url] = (validators, digest, next_url)
+        return validated_listings(listings, url), next_url if paginate else None
+
+async def crawl_to_output(
+    urls: List[str],
+    output_path: str,
+    output_format: str = "json",
+    concurrency: int = 16,
+    per_host: int = 4,
+    browsers: int = 4,
+    cards: bool = False,
+    max_pages: int = 1,
+    cache: Optional[FetchCache] = None
+) -> int:
+    """Crawl URLs concurrently, streaming NDJSON records or collecting a JSON catalog"""
+    collected: List[Dict[str, Any]] = []
+    # Content hashes appended by this crawl; earlier runs' records are deduplicated on compaction
+    seen: Set[str] = set()
+    scraped: List[str] = []
+    total = 0
+    async with BrowserPool(size=browsers) as browser_pool:
+        crawler = ListingCrawler(
+            concurrency=concurrency,
+            per_host=per_host,
+            browser_pool=browser_pool,
+            cards=cards,
+            max_pages=max_pages,
+            cache=cache
+        )
+        async for url, listings in crawler.crawl(urls):
+            total += len(listings)
+            if output_format == 'ndjson':
+                append_ndjson(listings, output_path, seen)
+                crawler.commit([url])
+            else:
+                collected.extend(listings)
+                scraped.append(url)
+    if output_format != 'ndjson':
+        write_catalog(collected, output_path)
+        crawler.commit(scraped)
+    return total
+
+def ingest_batch(
+    source: str,
+    output_path: str = "listings.json",
+    output_format: str = "json",
+    concurrency: int = 16,
+    per_host: int = 4,
+    browsers: int = 4,
+    cards: bool = False,
+    max_pages: int = 1,
+    cache_path: Optional[str] = None
+):
+    urls = read_urls(source)
+    logging.info(f"Starting batch ingestion of {len(urls)} URLs from {source} (concurrency={concurrency}, per_host={per_host}, browsers={browsers})")
+    cache = FetchCache(cache_path) if cache_path else None
+    try:
+        total = asyncio.run(crawl_to_output(urls, output_path, output_format, concurrency, per_host, browsers, cards, max_pages, cache))
+    finally:
+        if cache:
+            cache.close()
+    logging.info(f"Saved {total} listings from {len(urls)} URLs to {output_path}")
@@ -1,10 +1,23 @@
 import pandas as pd
 import mlflow
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
 from sklearn.metrics import accuracy_score
+from sklearn.pipeline import Pipeline
+from joblib import Memory, Parallel, delayed
 import joblib
-import json
+import numpy as np
+import argparse
+import logging
+import os
+
+from api.compact_forest import export_compact_model
+from api.lead_features import LeadFeaturePipeline
+from training_data import CHUNK_SIZE, JoinIndex, is_holdout, iter_joined_chunks, iter_records, join_chunks, write_parquet_shards
+
+# Raw lead fields consumed by LeadFeaturePipeline (missing ones are derived from the chat)
+FEATURE_COLUMNS = ['chat_text', 'messages', 'budget', 'message_count', 'response_latency']
 
 # --- Data Ingestion ---
 def load_data(chat_log_path, crm_log_path):
@@ -16,23 +29,137 @@ def load_data(chat_log_path, crm_log_path):
 
 # --- Feature Engineering ---
 def prepare_features(data):
-    # Example: intent, urgency, booking outcome, manual score
-    data['intent_score'] = data['chat_text'].str.contains('buy|urgent|now|call', case=False).astype(int)
+    # Raw lead records; LeadFeaturePipeline turns them into features at fit and serve time
     data['booked'] = (data['outcome'] == 'booked').astype(int)
-    X = data[['intent_score']]
+    X = data[[column for column in FEATURE_COLUMNS if column in data.columns]]
     y = data['booked']
     return X, y
 
+# Random forest hyperparameters tried by the cross-validated search
+PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [None, 20],
+    'min_samples_leaf': [1, 3],
+    'max_features': ['sqrt', 'log2'],
+}
+
+def build_lead_model(n_estimators=100, random_state=42, **params):
+    return Pipeline([
+        ('features', LeadFeaturePipeline()),
+        ('classifier', RandomForestClassifier(n_estimators=n_estimators, random_state=random_state, **params))
+    ])
+
+def save_model(model, model_out_path):
+    # Write then rename, so the serving registry never loads a half-written file
+    os.makedirs(os.path.dirname(model_out_path) or '.', exist_ok=True)
+    tmp_path = f"{model_out_path}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, model_out_path)
+
+def export_compact(model, model_out_path):
+    # Flattened-array export next to the pickle; the serving registry prefers it for the same version
+    compact_path = os.path.splitext(model_out_path)[0] + '.npz'
+    export_compact_model(model, compact_path)
+    logging.info(f"Exported compact model to {compact_path}")
+    return compact_path
+
 # --- Training ---
 def train_lead_model(chat_logs_path, crm_log_path, model_out_path):
     data = load_data(chat_logs_path, crm_log_path)
     X, y = prepare_features(data)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = build_lead_model()
     model.fit(X_train, y_train)
-    joblib.dump(model, model_out_path)
+    save_model(model, model_out_path)
     return model, X_test, y_test
 
+# --- Out-of-core Training ---
+def _split_chunks(chat_logs_path, index, chunk_size, holdout):
+    for chunk in join_chunks(chat_logs_path, index, chunk_size):
+        X, y = prepare_features(chunk)
+        mask = chunk['lead_id'].map(is_holdout).to_numpy() == holdout
+        if mask.any():
+            yield X[mask], y[mask]
+
+def train_lead_model_streaming(chat_logs_path, crm_log_path, model_out_path, chunk_size=CHUNK_SIZE, index_path=None):
+    """
+    Train without loading the data into memory: the CRM log is indexed on
+    disk, chat sessions are joined chunk by chunk, the feature pipeline is
+    fitted in a first pass and an SGD logistic regression with partial_fit
+    in a second. A stable 20% of lead ids is held out for accuracy.
+    """
+    with JoinIndex(index_path) as index:
+        logging.info(f"Indexed {index.build(iter_records(crm_log_path), chunk_size)} CRM records")
+        features = LeadFeaturePipeline().fit_chunks(
+            X for X, _ in _split_chunks(chat_logs_path, index, chunk_size, holdout=False)
+        )
+        classifier = SGDClassifier(loss='log_loss', random_state=42)
+        for X, y in _split_chunks(chat_logs_path, index, chunk_size, holdout=False):
+            classifier.partial_fit(features.transform(X), y, classes=[0, 1])
+        correct = total = 0
+        for X, y in _split_chunks(chat_logs_path, index, chunk_size, holdout=True):
+            correct += int((classifier.predict(features.transform(X)) == y.to_numpy()).sum())
+            total += len(y)
+    model = Pipeline([('features', features), ('classifier', classifier)])
+    save_model(model, model_out_path)
+    accuracy = correct / total if total else 0.0
+    return model, accuracy
+
+# --- Hyperparameter Search ---
+def _fold_features(X, train_index, test_index):
+    features = LeadFeaturePipeline().fit(X.iloc[train_index])
+    return features.transform(X.iloc[train_index]), features.transform(X.iloc[test_index])
+
+def _fit_fold(params, X_train, y_train, X_test, y_test):
+    # One core per fit: parallelism comes from running trials x folds side by side
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    model.fit(X_train, y_train)
+    return accuracy_score(y_test, model.predict(X_test))
+
+def search_lead_model(chat_logs_path, crm_log_path, model_out_path, param_grid=PARAM_GRID, cv=5, n_jobs=-1, cache_dir=None):
+    """
+    Cross-validated grid search over PARAM_GRID using all cores. The
+    feature pipeline doesn't depend on the forest's hyperparameters, so each
+    fold's feature matrices are built once (and cached on disk across runs
+    with `cache_dir`) and shared by every trial; trial x fold fits then run
+    in a joblib process pool. Every trial is logged to MLflow as a nested
+    run and the best parameters are refitted on all data.
+    """
+    data = load_data(chat_logs_path, crm_log_path)
+    X, y = prepare_features(data)
+    y = y.to_numpy()
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(X, y))
+    fold_features = Memory(cache_dir, verbose=0).cache(_fold_features) if cache_dir else _fold_features
+    matrices = Parallel(n_jobs=n_jobs)(delayed(fold_features)(X, train, test) for train, test in folds)
+
+    trials = list(ParameterGrid(param_grid))
+    logging.info(f"Searching {len(trials)} parameter sets x {cv} folds")
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(params, X_train, y[train], X_test, y[test])
+        for params in trials
+        for (train, test), (X_train, X_test) in zip(folds, matrices)
+    )
+    scores = np.array(scores).reshape(len(trials), cv)
+
+    with mlflow.start_run(run_name="lead_model_search"):
+        for i, (params, fold_scores) in enumerate(zip(trials, scores)):
+            log_model_to_mlflow(
+                None, fold_scores.mean(), params=params,
+                metrics={"accuracy_std": fold_scores.std()}, run_name=f"trial_{i}", nested=True
+            )
+        best = int(np.argmax(scores.mean(axis=1)))
+        best_params, best_accuracy = trials[best], float(scores[best].mean())
+        logging.info(f"Best parameters {best_params} with CV accuracy {best_accuracy:.4f}")
+
+        model = build_lead_model(**{'n_estimators': 100, **best_params, 'n_jobs': n_jobs})
+        model.fit(X, y)
+        # Serve single-threaded: per-request thread fan-out only adds latency
+        model.named_steps['classifier'].set_params(n_jobs=None)
+        save_model(model, model_out_path)
+        log_model_to_mlflow(model, best_accuracy, model_out_path, params=best_params, run_name="best", nested=True)
+        export_compact(model, model_out_path)
+    return model, best_params, best_accuracy
+
 # --- Evaluation ---
 def evaluate_model_accuracy(model, X_test, y_test):
     y_pred = model.predict(X_test)
@@ -40,14 +167,47 @@ def evaluate_model_accuracy(model, X_test, y_test):
     return acc
 
 # --- MLflow Logging ---
-def log_model_to_mlflow(model, accuracy, model_out_path):
-    with mlflow.start_run():
-        mlflow.sklearn.log_model(model, "lead_scorer")
+def log_model_to_mlflow(model, accuracy, model_out_path=None, params=None, metrics=None, run_name=None, nested=False):
+    with mlflow.start_run(run_name=run_name, nested=nested):
+        if params:
+            mlflow.log_params(params)
+        if model is not None:
+            mlflow.sklearn.log_model(model, "lead_scorer")
         mlflow.log_metric("accuracy", accuracy)
-        mlflow.log_artifact(model_out_path)
+        for name, value in (metrics or {}).items():
+            mlflow.log_metric(name, value)
+        if model_out_path:
+            mlflow.log_artifact(model_out_path)
 
 if __name__ == "__main__":
-    model, X_test, y_test = train_lead_model('chat_sessions.json', 'crm_log.json', 'models/lead_scorer_v1.pkl')
-    acc = evaluate_model_accuracy(model, X_test, y_test)
-    log_model_to_mlflow(model, acc, 'models/lead_scorer_v1.pkl')
-    print(f"Model trained and logged with accuracy: {acc}") 
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description="Train the lead scoring model.")
+    parser.add_argument('--chats', type=str, default='chat_sessions.json', help='Chat sessions (JSON array or NDJSON)')
+    parser.add_argument('--crm', type=str, default='crm_log.json', help='CRM log (JSON array or NDJSON)')
+    parser.add_argument('--output', type=str, default='models/lead_scorer_v2.pkl', help='Model output path')
+    parser.add_argument('--streaming', action='store_true', help='Train out-of-core with partial_fit (for data larger than memory)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Records per chunk when streaming')
+    parser.add_argument('--index', type=str, default=None, help='Keep the on-disk CRM join index at this path (default: temporary)')
+    parser.add_argument('--parquet-dir', type=str, default=None, help='Only write the joined data as Parquet shards to this directory')
+    parser.add_argument('--search', action='store_true', help='Cross-validated hyperparameter search over PARAM_GRID')
+    parser.add_argument('--compact', action='store_true', help='Also export the forest as flat arrays (.npz) for fast serving (always on with --search)')
+    parser.add_argument('--cv', type=int, default=5, help='Cross-validation folds for --search')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Worker processes for --search (-1: all cores)')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Cache fold feature matrices here across --search runs')
+    args = parser.parse_args()
+
+    if args.parquet_dir:
+        write_parquet_shards(iter_joined_chunks(args.chats, args.crm, args.chunk_size, args.index), args.parquet_dir)
+    elif args.search:
+        model, params, acc = search_lead_model(args.chats, args.crm, args.output, cv=args.cv, n_jobs=args.n_jobs, cache_dir=args.cache_dir)
+        print(f"Best model {params} trained and logged with CV accuracy: {acc}")
+    else:
+        if args.streaming:
+            model, acc = train_lead_model_streaming(args.chats, args.crm, args.output, args.chunk_size, args.index)
+        else:
+            model, X_test, y_test = train_lead_model(args.chats, args.crm, args.output)
+            acc = evaluate_model_accuracy(model, X_test, y_test)
+            if args.compact:
+                export_compact(model, args.output)
+        log_model_to_mlflow(model, acc, args.output)
+        print(f"Model trained and logged with accuracy: {acc}") 
\ No newline at end of file
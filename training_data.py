@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import zlib
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+# Optional Parquet output
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+JOIN_KEY = 'lead_id'
+CHUNK_SIZE = 10000
+# Bound on SQLite host parameters per lookup query
+LOOKUP_BATCH = 500
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from an NDJSON file, one line at a time. Legacy files
+    holding a single JSON array are still accepted but have to be loaded
+    whole.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == '[':
+            logging.warning(f"{path} is a JSON array, loading it into memory; convert it to NDJSON to stream it")
+            f.seek(0)
+            yield from json.load(f)
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def iter_chunks(records: Iterable[Dict[str, Any]], chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _key(value: Any) -> str:
+    # JSON encoding keeps 1 and "1" distinct, as pandas.merge does
+    return json.dumps(value)
+
+class JoinIndex:
+    """
+    Disk-backed index of one side of a join (the CRM log), keyed by lead_id.
+
+    Records are streamed into SQLite in chunks, so the indexed file never
+    has to fit in memory; lookups fetch a whole chunk of keys per query.
+    Duplicate keys are kept in file order, matching an inner pandas.merge.
+    """
+
+    def __init__(self, path: Optional[str] = None, key: str = JOIN_KEY):
+        self.key = key
+        self._tmp_dir = None
+        if path is None:
+            self._tmp_dir = tempfile.TemporaryDirectory(prefix='join_index_')
+            path = os.path.join(self._tmp_dir.name, 'index.sqlite3')
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS records (key TEXT NOT NULL, record TEXT NOT NULL)")
+
+    def __enter__(self) -> "JoinIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def build(self, records: Iterable[Dict[str, Any]], chunk_size: int = CHUNK_SIZE) -> int:
+        """Index records (dropping the index first so lookups stay fast on bulk load)"""
+        self._conn.execute("DROP INDEX IF EXISTS records_key")
+        self._conn.execute("DELETE FROM records")
+        total = 0
+        for chunk in iter_chunks(records, chunk_size):
+            self._conn.executemany(
+                "INSERT INTO records (key, record) VALUES (?, ?)",
+                [(_key(record.get(self.key)), json.dumps(record)) for record in chunk if record.get(self.key) is not None]
+            )
+            total += len(chunk)
+        self._conn.execute("CREATE INDEX records_key ON records (key)")
+        self._conn.commit()
+        return total
+
+    def lookup(self, keys: Iterable[Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Indexed records for each of the keys (by encoded key)"""
+        unique = list(dict.fromkeys(_key(key) for key in keys))
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        for start in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[start:start + LOOKUP_BATCH]
+            rows = self._conn.execute(
+                f"SELECT key, record FROM records WHERE key IN ({','.join('?' * len(batch))}) ORDER BY rowid",
+                batch
+            )
+            for key, record in rows:
+                found.setdefault(key, []).append(json.loads(record))
+        return found
+
+    def close(self):
+        self._conn.close()
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+
+def _merge(left: Dict[str, Any], right: Dict[str, Any], key: str) -> Dict[str, Any]:
+    # Same column naming as pandas.merge: overlapping columns get _x / _y suffixes
+    row = {}
+    for column, value in left.items():
+        row[f"{column}_x" if column != key and column in right else column] = value
+    for column, value in right.items():
+        if column != key:
+            row[f"{column}_y" if column in left else column] = value
+    return row
+
+def join_chunks(chat_log_path: str, index: JoinIndex, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Stream chat sessions in chunks, inner-joining each chunk against the CRM index"""
+    for chunk in iter_chunks(iter_records(chat_log_path), chunk_size):
+        matches = index.lookup(record.get(index.key) for record in chunk)
+        rows = [
+            _merge(record, match, index.key)
+            for record in chunk
+            for match in matches.get(_key(record.get(index.key)), ())
+        ]
+        if rows:
+            yield pd.DataFrame(rows)
+
+def iter_joined_chunks(
+    chat_log_path: str,
+    crm_log_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    index_path: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Inner-join chat sessions with the CRM log on lead_id without loading
+    either file: the CRM log is indexed on disk, then chat sessions are
+    streamed in chunks and each chunk is joined against the index.
+    """
+    with JoinIndex(index_path) as index:
+        indexed = index.build(iter_records(crm_log_path), chunk_size)
+        logging.info(f"Indexed {indexed} CRM records from {crm_log_path}")
+        yield from join_chunks(chat_log_path, index, chunk_size)
+
+def is_holdout(lead_id: Any, test_fraction: float = 0.2) -> bool:
+    """Stable train/test assignment by lead id, so streamed passes agree on the split"""
+    return zlib.crc32(_key(lead_id).encode('utf-8')) % 10000 < test_fraction * 10000
+
+def write_parquet_shards(chunks: Iterable[pd.DataFrame], out_dir: str) -> List[str]:
+    """Write each joined chunk as its own Parquet shard"""
+    if not PARQUET_AVAILABLE:
+        raise ImportError("pyarrow is not installed. Please install it to write Parquet shards.")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, chunk in enumerate(chunks):
+        path = os.path.join(out_dir, f"part-{i:05d}.parquet")
+        # Nested columns (e.g. messages) are stored as JSON text
+        chunk = chunk.apply(lambda column: column.map(lambda v: json.dumps(v) if isinstance(v, (list, dict)) else v))
+        chunk.to_parquet(path, index=False)
+        paths.append(path)
+    logging.info(f"Wrote {len(paths)} Parquet shards to {out_dir}")
+    return paths